@@ -1,31 +1,200 @@
-import aiohttp
+import asyncio
+import json
 import os
+import random
 
+import aiohttp
 from dotenv import load_dotenv
 
+from metrics import stage_seconds, upstream_responses_total, record_usage
+
 load_dotenv()
 
 YANDEX_API = os.getenv('YANDEX_API_KEY')
 YANDEX_MODEL = os.getenv('YANDEX_MODEL')
+YANDEX_API_URL = os.getenv('YANDEX_API_URL', "https://llm.api.cloud.yandex.net/foundationModels/v1/completion")
 
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
-async def get_gpt_interpretation(cards: list[str]) -> str:
+
+class YandexClient:
     """
-       Fetches a GPT-based interpretation of a Tarot card spread from Yandex API.
+    Long-lived HTTP client for the Yandex completion API.
+
+    Keeps one pooled `aiohttp.ClientSession` with keep-alive and DNS caching
+    for the whole bot lifetime and retries 429/5xx responses with jittered
+    exponential backoff.
+    """
+
+    def __init__(self, url: str = YANDEX_API_URL, api_key: str | None = YANDEX_API,
+                 pool_size: int = 100, keepalive_timeout: float = 30.0, dns_cache_ttl: int = 300,
+                 connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0):
+        """
+        Args:
+            url (str): The completion endpoint.
+            api_key (str | None): The Yandex API key.
+            pool_size (int): Maximum number of simultaneous connections.
+            keepalive_timeout (float): Seconds an idle connection is kept open.
+            dns_cache_ttl (int): Seconds resolved addresses are cached.
+            connect_timeout (float): Timeout for establishing a connection.
+            read_timeout (float): Timeout between two reads from the socket.
+            max_retries (int): Number of retries on 429/5xx and network errors.
+            backoff_base (float): Base delay of the exponential backoff.
+            backoff_max (float): Upper bound of a single backoff delay.
+        """
+        self.url = url
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session: aiohttp.ClientSession | None = None
+
+    @classmethod
+    def from_env(cls) -> 'YandexClient':
+        """
+        Creates a client configured by the `YANDEX_*` environment variables.
+        """
+        return cls(
+            pool_size=int(os.getenv('YANDEX_POOL_SIZE', 100)),
+            keepalive_timeout=float(os.getenv('YANDEX_KEEPALIVE_TIMEOUT', 30)),
+            dns_cache_ttl=int(os.getenv('YANDEX_DNS_CACHE_TTL', 300)),
+            connect_timeout=float(os.getenv('YANDEX_CONNECT_TIMEOUT', 5)),
+            read_timeout=float(os.getenv('YANDEX_READ_TIMEOUT', 60)),
+            max_retries=int(os.getenv('YANDEX_MAX_RETRIES', 3)),
+        )
+
+    async def start(self):
+        """
+        Opens the pooled session. Does nothing if it is already open.
+        """
+        if self.session is not None and not self.session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Api-Key {self.api_key}"
+            },
+        )
+
+    async def close(self):
+        """
+        Closes the pooled session and all its connections.
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _backoff(self, attempt: int, retry_after: str | None = None) -> float:
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def complete(self, prompt: dict) -> dict:
+        """
+        Sends a completion request, retrying on 429/5xx and network errors.
+
+        Args:
+            prompt (dict): The request body.
+
+        Returns:
+            dict: The decoded JSON response.
+
+        Raises:
+            Exception: If the API request fails after all retries.
+        """
+        await self.start()
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                with stage_seconds.time('llm'):
+                    async with self.session.post(self.url, json=prompt) as response:
+                        upstream_responses_total.inc(str(response.status))
+                        if response.status == 200:
+                            result = await response.json()
+                            record_usage(result)
+                            return result
+                        if response.status not in RETRY_STATUSES or last_attempt:
+                            raise Exception(f"Ошибка API: {response.status}")
+                        delay = self._backoff(attempt, response.headers.get('Retry-After'))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                upstream_responses_total.inc(type(e).__name__)
+                if last_attempt:
+                    raise
+                delay = self._backoff(attempt)
+            await asyncio.sleep(delay)
+
+    async def stream(self, prompt: dict):
+        """
+        Sends a streaming completion request and yields every decoded chunk.
+        Retries on 429/5xx and network errors only until the first chunk arrives.
+
+        Args:
+            prompt (dict): The request body with `stream` enabled.
+
+        Yields:
+            dict: The decoded JSON chunks.
+
+        Raises:
+            Exception: If the API request fails after all retries.
+        """
+        await self.start()
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            chunk = None
+            try:
+                with stage_seconds.time('llm'):
+                    async with self.session.post(self.url, json=prompt) as response:
+                        upstream_responses_total.inc(str(response.status))
+                        if response.status == 200:
+                            async for line in response.content:
+                                line = line.strip()
+                                if line:
+                                    chunk = json.loads(line)
+                                    yield chunk
+                            if chunk is not None:
+                                record_usage(chunk)
+                            return
+                        if response.status not in RETRY_STATUSES or last_attempt:
+                            raise Exception(f"Ошибка API: {response.status}")
+                        delay = self._backoff(attempt, response.headers.get('Retry-After'))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                upstream_responses_total.inc(type(e).__name__)
+                if last_attempt or chunk is not None:
+                    raise
+                delay = self._backoff(attempt)
+            await asyncio.sleep(delay)
+
+
+yandex_client = YandexClient.from_env()
+
+
+def build_prompt(cards: list[str], stream: bool = False) -> dict:
+    """
+       Builds the completion request body for a Tarot card spread.
 
        Args:
            cards (list[str]): List of card names to interpret.
+           stream (bool): Whether the completion should be streamed.
 
        Returns:
-           str: The interpretation text.
-
-       Raises:
-           Exception: If the API request fails.
+           dict: The request body.
        """
-    prompt = {
+    return {
         "modelUri": f"{YANDEX_MODEL}",
         "completionOptions": {
-            "stream": False,
+            "stream": stream,
             "temperature": 0.6,
             "maxTokens": "2000"
         },
@@ -43,16 +212,36 @@ async def get_gpt_interpretation(cards: list[str]) -> str:
         ]
     }
 
-    url = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Api-Key {YANDEX_API}"
-    }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, headers=headers, json=prompt) as response:
-            if response.status == 200:
-                result = await response.json()
-                return result['result']['alternatives'][0]['message']['text']
-            else:
-                raise Exception(f"Ошибка API: {response.status}")
+async def get_gpt_interpretation(cards: list[str]) -> str:
+    """
+       Fetches a GPT-based interpretation of a Tarot card spread from Yandex API.
+
+       Args:
+           cards (list[str]): List of card names to interpret.
+
+       Returns:
+           str: The interpretation text.
+
+       Raises:
+           Exception: If the API request fails.
+       """
+    result = await yandex_client.complete(build_prompt(cards))
+    return result['result']['alternatives'][0]['message']['text']
+
+
+async def stream_gpt_interpretation(cards: list[str]):
+    """
+       Streams a GPT-based interpretation of a Tarot card spread from Yandex API.
+
+       Args:
+           cards (list[str]): List of card names to interpret.
+
+       Yields:
+           str: The interpretation text generated so far.
+
+       Raises:
+           Exception: If the API request fails.
+       """
+    async for chunk in yandex_client.stream(build_prompt(cards, stream=True)):
+        yield chunk['result']['alternatives'][0]['message']['text']
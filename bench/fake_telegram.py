@@ -0,0 +1,117 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import defaultdict
+
+from aiohttp import web
+
+
+class FakeTelegram:
+    """
+    Local stand-in for the Telegram Bot API.
+
+    Serves synthetic updates through getUpdates and records every message
+    the bot sends, with a timestamp, per chat.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Args:
+            latency (float): Seconds added to every sending method.
+        """
+        self.latency = latency
+        self.updates: list[dict] = []
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.file_ids = itertools.count(1)
+        self.new_updates = asyncio.Event()
+        self.injected_at: dict[int, float] = {}
+        self.events: dict[int, list[tuple[float, str, str]]] = defaultdict(list)
+        self.calls: dict[str, int] = defaultdict(int)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        return app
+
+    def push_command(self, user_id: int, text: str = '/tarot'):
+        """
+        Queues a message from a user, to be returned by the next getUpdates.
+
+        Args:
+            user_id (int): The user id, also used as the chat id.
+            text (str): The message text.
+        """
+        update_id = next(self.update_ids)
+        message = {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'},
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        self.updates.append({'update_id': update_id, 'message': message})
+        self.injected_at[user_id] = time.monotonic()
+        self.new_updates.set()
+
+    def _message(self, chat_id: int, **fields) -> dict:
+        return {
+            'message_id': next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': 1, 'is_bot': True, 'first_name': 'bench'},
+            **fields,
+        }
+
+    def _photo(self) -> list[dict]:
+        number = next(self.file_ids)
+        return [{'file_id': f'photo-{number}', 'file_unique_id': f'unique-{number}', 'width': 344, 'height': 600}]
+
+    async def _get_updates(self, params) -> list[dict]:
+        offset = int(params.get('offset') or 0)
+        timeout = float(params.get('timeout') or 0)
+        self.updates = [update for update in self.updates if update['update_id'] >= offset]
+        if not self.updates and timeout:
+            self.new_updates.clear()
+            try:
+                await asyncio.wait_for(self.new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.updates[:int(params.get('limit') or 100)]
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        self.calls[method] += 1
+        if request.content_type == 'application/json':
+            params = await request.json()
+        else:
+            params = await request.post()
+
+        if method == 'getUpdates':
+            return web.json_response({'ok': True, 'result': await self._get_updates(params)})
+        if method == 'getMe':
+            return web.json_response({'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'bench', 'username': 'bench_bot'}})
+
+        await asyncio.sleep(self.latency)
+        chat_id = int(params.get('chat_id', 0))
+        now = time.monotonic()
+        if method == 'sendPhoto':
+            self.events[chat_id].append((now, 'photo', params.get('caption', '')))
+            result = self._message(chat_id, photo=self._photo())
+        elif method == 'sendMediaGroup':
+            media = json.loads(params['media'])
+            self.events[chat_id].append((now, 'photo', ''))
+            result = [self._message(chat_id, photo=self._photo()) for _ in media]
+        elif method == 'sendMessage':
+            self.events[chat_id].append((now, 'message', params.get('text', '')))
+            result = self._message(chat_id, text=params.get('text', ''))
+        elif method == 'editMessageText':
+            self.events[chat_id].append((now, 'edit', params.get('text', '')))
+            result = self._message(chat_id, text=params.get('text', ''))
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
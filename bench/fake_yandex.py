@@ -0,0 +1,83 @@
+import asyncio
+import json
+import random
+from collections import defaultdict
+
+from aiohttp import web
+
+
+class FakeYandex:
+    """
+    Local stand-in for the Yandex completion endpoint with configurable
+    latency, error rate and rate limiting.
+    """
+
+    def __init__(self, latency: float = 1.0, jitter: float = 0.2, error_rate: float = 0.0,
+                 max_concurrency: int = 0, chunks: int = 5, seed: int = 0):
+        """
+        Args:
+            latency (float): Mean seconds needed to generate a completion.
+            jitter (float): Relative spread of the latency, 0.2 means ±20%.
+            error_rate (float): Share of requests answered with 500.
+            max_concurrency (int): Requests above this number of simultaneous
+                ones get 429; 0 disables the limit.
+            chunks (int): Number of chunks a streamed completion is split into.
+            seed (int): Seed of the random generator, for reproducible runs.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_concurrency = max_concurrency
+        self.chunks = chunks
+        self.random = random.Random(seed)
+        self.active = 0
+        self.statuses: dict[int, int] = defaultdict(int)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/completion', self.handle)
+        return app
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency * (1 + self.random.uniform(-self.jitter, self.jitter)))
+
+    @staticmethod
+    def _result(text: str, status: str) -> dict:
+        return {'result': {
+            'alternatives': [{'message': {'role': 'assistant', 'text': text}, 'status': status}],
+            'usage': {'inputTextTokens': '60', 'completionTokens': str(len(text.split())),
+                      'totalTokens': str(60 + len(text.split()))},
+            'modelVersion': 'bench',
+        }}
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        if self.max_concurrency and self.active >= self.max_concurrency:
+            self.statuses[429] += 1
+            return web.Response(status=429)
+        if self.random.random() < self.error_rate:
+            self.statuses[500] += 1
+            return web.Response(status=500)
+
+        self.active += 1
+        try:
+            prompt = await request.json()
+            cards = prompt['messages'][-1]['text']
+            words = f'Шуточное толкование: {cards}. '.split() * 10
+            delay = self._delay()
+            if not prompt['completionOptions'].get('stream'):
+                await asyncio.sleep(delay)
+                self.statuses[200] += 1
+                return web.json_response(self._result(' '.join(words), 'ALTERNATIVE_STATUS_FINAL'))
+
+            response = web.StreamResponse()
+            await response.prepare(request)
+            for number in range(1, self.chunks + 1):
+                await asyncio.sleep(delay / self.chunks)
+                text = ' '.join(words[:len(words) * number // self.chunks])
+                status = 'ALTERNATIVE_STATUS_FINAL' if number == self.chunks else 'ALTERNATIVE_STATUS_PARTIAL'
+                await response.write(json.dumps(self._result(text, status), ensure_ascii=False).encode() + b'\n')
+            await response.write_eof()
+            self.statuses[200] += 1
+            return response
+        finally:
+            self.active -= 1
@@ -0,0 +1,245 @@
+"""
+Load test of the bot handlers against local fake Telegram and Yandex servers.
+
+Runs the real `Dispatcher` from `run.py` with long polling against a fake
+Bot API server, replays synthetic /tarot presses at a target rate and reports
+throughput, per-stage latency percentiles and error counts. Nothing leaves
+the machine, so runs are reproducible in CI:
+
+    python bench/run_bench.py --requests 200 --rate 20 --output bench.json
+    python bench/run_bench.py --requests 200 --rate 20 --baseline bench.json --max-regression 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [REPO_DIR, BENCH_DIR]
+
+from fake_telegram import FakeTelegram  # noqa: E402
+from fake_yandex import FakeYandex  # noqa: E402
+
+STAGES = ('images', 'interpretation_first', 'done')
+NOTICES = ('Много желающих', 'Ваш расклад уже готовится', 'Следующий расклад')
+FALLBACK = 'Духи нейросети сейчас заняты'
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark of the tarot bot handlers')
+    parser.add_argument('--requests', type=int, default=100, help='number of /tarot presses, one per user')
+    parser.add_argument('--rate', type=float, default=10.0, help='presses per second')
+    parser.add_argument('--stream', choices=('1', '0'), default='1', help='INTERPRETATION_STREAM')
+    parser.add_argument('--delivery', choices=('album', 'photos'), default='album', help='SPREAD_DELIVERY')
+    parser.add_argument('--edit-interval', type=float, default=1.5, help='STREAM_EDIT_INTERVAL')
+    parser.add_argument('--pool-size', type=int, default=0, help='SPREAD_POOL_SIZE')
+    parser.add_argument('--pool-refill-rate', type=float, default=0.5, help='SPREAD_POOL_REFILL_RATE')
+    parser.add_argument('--warmup', type=float, default=0.0, help='seconds to idle before the first press')
+    parser.add_argument('--telegram-latency', type=float, default=0.02)
+    parser.add_argument('--yandex-latency', type=float, default=1.0)
+    parser.add_argument('--yandex-jitter', type=float, default=0.2)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--yandex-max-concurrency', type=int, default=0, help='answer 429 above this, 0 = off')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=120.0, help='seconds to wait for all spreads')
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    parser.add_argument('--baseline', help='compare with a report written by --output')
+    parser.add_argument('--max-regression', type=float,
+                        help='exit with 1 if a p95 latency grows by more than this many percent')
+    return parser.parse_args()
+
+
+async def start_site(app: web.Application) -> tuple[web.AppRunner, str]:
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f'http://{host}:{port}'
+
+
+def percentile(values: list[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))]
+
+
+def summarize(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean': round(sum(values) / len(values), 4),
+        'p50': round(percentile(values, 0.50), 4),
+        'p95': round(percentile(values, 0.95), 4),
+        'p99': round(percentile(values, 0.99), 4),
+    }
+
+
+def classify(telegram: FakeTelegram, user_id: int) -> tuple[str | None, dict[str, float]]:
+    """
+    Splits the messages sent to one user into stage timings.
+
+    Returns:
+        The outcome (`ok`, `truncated` for a stream cut short, `fallback` for
+        a local interpretation, `error`, `rejected` or None while pending)
+        and the stage latencies counted from the press.
+    """
+    started_at = telegram.injected_at[user_id]
+    stages = {}
+    outcome = None
+    interpretation = ''
+    for at, kind, text in telegram.events.get(user_id, []):
+        if kind == 'photo':
+            stages.setdefault('images', at - started_at)
+        elif kind == 'message' and text.startswith('Произошла ошибка'):
+            outcome = 'error'
+        elif kind == 'message' and text.startswith('Сейчас слишком много'):
+            outcome = 'rejected'
+        elif kind == 'message' and text.startswith(FALLBACK):
+            outcome = 'fallback'
+        elif kind == 'message' and not text.startswith(NOTICES):
+            stages.setdefault('interpretation_first', at - started_at)
+            interpretation = text
+        elif kind == 'edit':
+            interpretation = text
+        stages['done'] = at - started_at
+    if outcome is None and 'interpretation_first' in stages and 'images' in stages:
+        outcome = 'truncated' if interpretation.endswith('…') else 'ok'
+    return outcome, stages
+
+
+async def wait_until_finished(telegram: FakeTelegram, users: list[int], timeout: float, quiet: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        pending = [user for user in users if classify(telegram, user)[0] is None]
+        last_event = max((events[-1][0] for events in telegram.events.values() if events), default=0)
+        if not pending and time.monotonic() - last_event > quiet:
+            return
+        await asyncio.sleep(0.1)
+
+
+async def bench(args: argparse.Namespace) -> dict:
+    telegram = FakeTelegram(latency=args.telegram_latency)
+    yandex = FakeYandex(latency=args.yandex_latency, jitter=args.yandex_jitter, error_rate=args.error_rate,
+                        max_concurrency=args.yandex_max_concurrency, seed=args.seed)
+    telegram_runner, telegram_url = await start_site(telegram.app())
+    yandex_runner, yandex_url = await start_site(yandex.app())
+
+    os.environ.update({
+        'TOKEN': '123456:bench',
+        'YANDEX_API_KEY': 'bench',
+        'YANDEX_MODEL': 'bench',
+        'YANDEX_API_URL': f'{yandex_url}/completion',
+        'STATE_BACKEND': 'memory',
+        'USER_COOLDOWN': '0',
+        'INTERPRETATION_STREAM': args.stream,
+        'SPREAD_DELIVERY': args.delivery,
+        'STREAM_EDIT_INTERVAL': str(args.edit_interval),
+        'SPREAD_POOL_SIZE': str(args.pool_size),
+        'SPREAD_POOL_REFILL_RATE': str(args.pool_refill_rate),
+    })
+    random.seed(args.seed)
+    import run
+    from metrics import fallbacks_total
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    bot = Bot(token=os.environ['TOKEN'],
+              session=AiohttpSession(api=TelegramAPIServer.from_base(telegram_url)))
+    polling = asyncio.create_task(run.dp.start_polling(bot, polling_timeout=1, handle_signals=False))
+    await asyncio.sleep(args.warmup)
+
+    users = [100000 + number for number in range(args.requests)]
+    started_at = time.monotonic()
+    for number, user_id in enumerate(users):
+        await asyncio.sleep(max(0.0, started_at + number / args.rate - time.monotonic()))
+        telegram.push_command(user_id)
+    await wait_until_finished(telegram, users, args.timeout, quiet=max(1.0, 2 * args.edit_interval))
+
+    await run.dp.stop_polling()
+    await polling
+    await telegram_runner.cleanup()
+    await yandex_runner.cleanup()
+
+    outcomes = {'ok': 0, 'truncated': 0, 'fallback': 0, 'error': 0, 'rejected': 0, 'timeout': 0}
+    latencies = {stage: [] for stage in STAGES}
+    finished_at = started_at
+    for user_id in users:
+        outcome, stages = classify(telegram, user_id)
+        outcomes[outcome or 'timeout'] += 1
+        # Only complete answers of the Yandex API count towards the latencies.
+        if outcome == 'ok':
+            for stage, value in stages.items():
+                latencies[stage].append(value)
+            finished_at = max(finished_at, telegram.injected_at[user_id] + stages['done'])
+
+    elapsed = finished_at - started_at
+    return {
+        'config': {key: value for key, value in vars(args).items()
+                   if key not in ('output', 'baseline', 'max_regression')},
+        'throughput': round(outcomes['ok'] / elapsed, 3) if elapsed > 0 else 0.0,
+        'outcomes': outcomes,
+        'stages': {stage: summarize(values) for stage, values in latencies.items()},
+        'yandex_statuses': dict(sorted(yandex.statuses.items())),
+        'telegram_calls': dict(sorted(telegram.calls.items())),
+        'spread_pool': run.spread_pool.stats(),
+        'circuit_breaker': run.breaker.stats(),
+        'fallbacks': {labels[0]: value for labels, value in sorted(fallbacks_total.values.items())},
+    }
+
+
+def compare(report: dict, baseline: dict) -> dict[str, float]:
+    """
+    Returns the relative change of the throughput and every stage percentile, in percent.
+    """
+    changes = {}
+    if baseline.get('throughput'):
+        changes['throughput'] = (report['throughput'] / baseline['throughput'] - 1) * 100
+    for stage in STAGES:
+        for name in ('p50', 'p95', 'p99'):
+            old = baseline['stages'].get(stage, {}).get(name)
+            new = report['stages'].get(stage, {}).get(name)
+            if old and new is not None:
+                changes[f'{stage}.{name}'] = (new / old - 1) * 100
+    return {name: round(change, 1) for name, change in changes.items()}
+
+
+def main():
+    args = parse_args()
+    for name in ('output', 'baseline'):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+    workdir = tempfile.mkdtemp(prefix='tarot-bench-')
+    shutil.copy(os.path.join(REPO_DIR, 'tarocards.db'), workdir)
+    os.chdir(workdir)
+    try:
+        report = asyncio.run(bench(args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as file:
+            report['changes'] = compare(report, json.load(file))
+        if args.max_regression is not None:
+            regressions = [name for name, change in report['changes'].items()
+                           if name.endswith('.p95') and change > args.max_regression]
+            exit_code = 1 if regressions else 0
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
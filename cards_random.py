@@ -1,29 +1,75 @@
-import sqlite3
-from aiogram.types import Message
+import asyncio
+import logging
 
-async def get_random_cards(message: Message) -> list[str]:
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import Message, InputMediaPhoto
+
+from deck import deck, Card, Spread
+from metrics import stage_seconds
+
+
+def card_caption(card: Card) -> str:
+    return f"Карта Таро: {card.name}\nОписание: {card.description}"
+
+
+async def send_spread(message: Message, spread: Spread, album: bool = False):
     """
-        Retrieves and displays three random Tarot cards from the database.
+        Sends every card of a spread as a photo with its description.
+        Uses the cached Telegram file id when available and remembers
+        the file id of first uploads.
 
         Args:
             message (Message): The message object to send the card details to.
+            spread (Spread): The drawn cards.
+            album (bool): Send all cards in a single media group
+                instead of one message per card.
+    """
+    with stage_seconds.time('images'):
+        if album:
+            sent_messages = await message.answer_media_group([
+                InputMediaPhoto(media=card.photo, caption=card_caption(card))
+                for card in spread.cards
+            ])
+        else:
+            sent_messages = [
+                await message.answer_photo(card.photo, caption=card_caption(card))
+                for card in spread.cards
+            ]
+
+    for card, sent in zip(spread.cards, sent_messages):
+        if card.file_id is None and sent.photo:
+            await deck.remember_file_id(card, sent.photo[-1].file_id)
+
+
+async def warm_up_file_ids(bot: Bot, chat_id: int | str, delay: float = 1.0) -> int:
+    """
+        Uploads every card without a cached file id to a service chat,
+        so that users never wait for Telegram to fetch the image by URL.
+
+        Args:
+            bot (Bot): The bot instance.
+            chat_id (int | str): The service chat to upload the cards to.
+            delay (float): Pause between uploads to stay under flood limits.
 
         Returns:
-            list[str]: List of card names.
+            int: Number of uploaded cards.
     """
-    jpt = []
-    with sqlite3.connect('tarocards.db') as conn:
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT * FROM old_cards ORDER BY random() LIMIT 1")
-        for card in cursor.fetchall():
-            response = f"Карта Таро: {card[1]}\nОписание: {card[2]}"
-            await message.answer_photo(card[3], caption=response)
-            jpt.append(card[1])
-
-        cursor.execute("SELECT * FROM new_cards ORDER BY random() LIMIT 2")
-        for card in cursor.fetchall():
-            response = f"Карта Таро: {card[1]}\nОписание: {card[2]}"
-            await message.answer_photo(card[3], caption=response)
-            jpt.append(card[1])
-    return jpt
+    from catalog import tarot_cards, tarot_cards_jr
+
+    uploaded = 0
+    for name, _, _ in tarot_cards + tarot_cards_jr:
+        card = deck.find(name)
+        if card is None or card.file_id:
+            continue
+        while True:
+            try:
+                sent = await bot.send_photo(chat_id, card.url, caption=card.name)
+                break
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+        await deck.remember_file_id(card, sent.photo[-1].file_id)
+        uploaded += 1
+        logging.info('Uploaded card %s', card.name)
+        await asyncio.sleep(delay)
+    return uploaded
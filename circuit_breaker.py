@@ -0,0 +1,181 @@
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+T = TypeVar('T')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpen(Exception):
+    """
+    Raised when the circuit breaker rejects a call without trying the upstream.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling a struggling upstream.
+
+    Every call gets `budget` seconds. After `failure_threshold` consecutive
+    failures or timeouts the breaker opens and rejects calls at once with
+    `CircuitOpen`. After `reset_timeout` seconds it lets a single probe call
+    through (half-open): success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, budget: float = 15.0, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            budget (float): Seconds a call or a whole stream may take.
+            failure_threshold (int): Consecutive failures that open the breaker.
+            reset_timeout (float): Seconds the breaker stays open before a probe.
+        """
+        self.budget = budget
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    @classmethod
+    def from_env(cls) -> 'CircuitBreaker':
+        """
+        Creates a breaker configured by the `INTERPRETATION_BUDGET` and `BREAKER_*` environment variables.
+        """
+        return cls(
+            budget=float(os.getenv('INTERPRETATION_BUDGET', 15)),
+            failure_threshold=int(os.getenv('BREAKER_FAILURES', 5)),
+            reset_timeout=float(os.getenv('BREAKER_RESET_TIMEOUT', 30)),
+        )
+
+    def is_open(self) -> bool:
+        """
+        Returns True if a call made now would be rejected.
+        """
+        if self.state == OPEN:
+            return time.monotonic() - self.opened_at < self.reset_timeout
+        return self.state == HALF_OPEN and self._probing
+
+    def _allow(self) -> bool:
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def _success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def _failure(self, error: Exception):
+        self._probing = False
+        self.failures += 1
+        if isinstance(error, TimeoutError):
+            self.timeouts += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opened += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def _abandon(self):
+        # A cancelled call says nothing about the upstream, but frees the probe.
+        self._probing = False
+
+    def _check(self):
+        if not self._allow():
+            self.rejected += 1
+            raise CircuitOpen()
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs an upstream call within the budget.
+
+        Args:
+            fn (Callable[[], Awaitable[T]]): Starts the upstream call.
+
+        Returns:
+            T: The result of the call.
+
+        Raises:
+            CircuitOpen: If the breaker is open.
+            TimeoutError: If the call took longer than the budget.
+        """
+        self._check()
+        try:
+            result = await asyncio.wait_for(fn(), self.budget)
+        except asyncio.CancelledError:
+            self._abandon()
+            raise
+        except Exception as e:
+            self._failure(e)
+            raise
+        self._success()
+        return result
+
+    async def stream(self, fn: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """
+        Runs an upstream stream that has to finish within the budget.
+
+        Args:
+            fn (Callable[[], AsyncIterator[T]]): Starts the upstream stream.
+
+        Yields:
+            T: The values of the stream.
+
+        Raises:
+            CircuitOpen: If the breaker is open.
+            TimeoutError: If the stream took longer than the budget.
+        """
+        self._check()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.budget
+        iterator = fn()
+        try:
+            while True:
+                try:
+                    value = await asyncio.wait_for(anext(iterator), max(0.0, deadline - loop.time()))
+                except StopAsyncIteration:
+                    break
+                yield value
+        except (asyncio.CancelledError, GeneratorExit):
+            self._abandon()
+            raise
+        except Exception as e:
+            self._failure(e)
+            raise
+        finally:
+            await iterator.aclose()
+        self._success()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns whether the breaker is open, the consecutive failures
+        and the open, rejection and timeout counters.
+        """
+        return {
+            'open': int(self.is_open()),
+            'failures': self.failures,
+            'opened': self.opened,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+        }
+
+
+breaker = CircuitBreaker.from_env()
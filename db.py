@@ -0,0 +1,232 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, TypeVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_PATH = 'tarocards.db'
+
+T = TypeVar('T')
+
+
+def connect(db_path: str = DB_PATH, busy_timeout: float = 10.0,
+            cached_statements: int = 256) -> sqlite3.Connection:
+    """
+    Opens a database connection configured for concurrent use by several processes:
+    WAL journal, so readers don't block the writer, and a busy timeout,
+    so concurrent writers wait for the lock instead of failing.
+
+    The connection may be closed from another thread than the one using it,
+    which lets a pool close the connections of its threads.
+
+    Args:
+        db_path (str): Path to the SQLite database.
+        busy_timeout (float): Seconds to wait for a lock held by another connection.
+        cached_statements (int): Number of prepared statements kept per connection.
+
+    Returns:
+        sqlite3.Connection: The configured connection.
+    """
+    connection = sqlite3.connect(db_path, timeout=busy_timeout, cached_statements=cached_statements,
+                                 check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class Database:
+    """
+    Asynchronous access to the SQLite database.
+
+    Queries run on a dedicated thread pool, every thread keeping one pooled
+    connection, so statements are prepared once per thread and reused,
+    and the event loop never waits for the disk. Writes go through a single
+    writer thread and are batched: statements queued while a batch is being
+    committed are committed together in the next transaction.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, pool_size: int = 4, max_batch: int = 256):
+        """
+        Args:
+            db_path (str): Path to the SQLite database.
+            pool_size (int): Number of threads serving reads.
+            max_batch (int): Maximum number of statements committed in one transaction.
+        """
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self._readers = ThreadPoolExecutor(pool_size, thread_name_prefix='db-read')
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix='db-write')
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._pending: list[tuple[str, Any, bool, asyncio.Future]] = []
+        self._flusher: asyncio.Task | None = None
+        self.reads = 0
+        self.writes = 0
+        self.batches = 0
+
+    @classmethod
+    def from_env(cls) -> 'Database':
+        """
+        Creates a database configured by the `DB_POOL_SIZE` and `DB_MAX_BATCH` environment variables.
+        """
+        return cls(
+            pool_size=int(os.getenv('DB_POOL_SIZE', 4)),
+            max_batch=int(os.getenv('DB_MAX_BATCH', 256)),
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = connect(self.db_path)
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _call(self, fn: Callable[..., T], args: tuple) -> T:
+        return fn(self._connection(), *args)
+
+    def _transaction(self, fn: Callable[..., T], args: tuple) -> T:
+        with self._connection() as connection:
+            return fn(connection, *args)
+
+    async def run(self, fn: Callable[..., T], *args, write: bool = False) -> T:
+        """
+        Calls `fn(connection, *args)` on a pooled connection.
+
+        Args:
+            fn (Callable[..., T]): The function to call.
+            *args: Further arguments of the function.
+            write (bool): Run on the writer thread inside a transaction,
+                for schema changes and other multi-statement writes.
+
+        Returns:
+            T: The result of the function.
+        """
+        loop = asyncio.get_running_loop()
+        if write:
+            return await loop.run_in_executor(self._writer, self._transaction, fn, args)
+        self.reads += 1
+        return await loop.run_in_executor(self._readers, self._call, fn, args)
+
+    @staticmethod
+    def _fetchall(connection: sqlite3.Connection, sql: str, parameters: Iterable) -> list[tuple]:
+        return connection.execute(sql, parameters).fetchall()
+
+    @staticmethod
+    def _fetchone(connection: sqlite3.Connection, sql: str, parameters: Iterable) -> tuple | None:
+        return connection.execute(sql, parameters).fetchone()
+
+    async def fetchall(self, sql: str, parameters: Iterable = ()) -> list[tuple]:
+        """
+        Runs a query and returns all its rows.
+        """
+        return await self.run(self._fetchall, sql, parameters)
+
+    async def fetchone(self, sql: str, parameters: Iterable = ()) -> tuple | None:
+        """
+        Runs a query and returns its first row, or None if there are no rows.
+        """
+        return await self.run(self._fetchone, sql, parameters)
+
+    async def write(self, sql: str, parameters: Iterable = ()) -> int:
+        """
+        Queues a statement for the next write batch and waits until it is committed.
+
+        Args:
+            sql (str): The statement.
+            parameters (Iterable): Its parameters.
+
+        Returns:
+            int: The number of rows the statement changed.
+        """
+        return await self._queue(sql, parameters, False)
+
+    async def write_many(self, sql: str, rows: Iterable[Iterable]) -> int:
+        """
+        Queues a statement executed once per row for the next write batch
+        and waits until it is committed.
+
+        Args:
+            sql (str): The statement.
+            rows (Iterable[Iterable]): The parameters of every execution.
+
+        Returns:
+            int: The number of rows the statement changed.
+        """
+        return await self._queue(sql, list(rows), True)
+
+    async def _queue(self, sql: str, parameters: Any, many: bool) -> int:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((sql, parameters, many, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+        return await future
+
+    async def _flush(self):
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            statements = [(sql, parameters, many) for sql, parameters, many, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._writer, self._write_batch, statements)
+            except Exception as e:
+                results = [e] * len(batch)
+            self.batches += 1
+            self.writes += len(batch)
+            for (*_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _write_batch(self, statements: list[tuple[str, Any, bool]]) -> list[int | Exception]:
+        # A failed statement is rolled back on its own and doesn't fail the rest of the batch.
+        results = []
+        with self._connection() as connection:
+            for sql, parameters, many in statements:
+                try:
+                    if many:
+                        cursor = connection.executemany(sql, parameters)
+                    else:
+                        cursor = connection.execute(sql, parameters)
+                    results.append(cursor.rowcount)
+                except sqlite3.Error as e:
+                    results.append(e)
+        return results
+
+    async def close(self):
+        """
+        Commits the queued writes and closes the thread pool and its connections.
+        """
+        if self._flusher is not None:
+            await self._flusher
+        loop = asyncio.get_running_loop()
+        for executor in (self._readers, self._writer):
+            await loop.run_in_executor(None, executor.shutdown)
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the read, write and batch counters and the number of queued writes.
+        """
+        return {
+            'reads': self.reads,
+            'writes': self.writes,
+            'batches': self.batches,
+            'pending': len(self._pending),
+        }
+
+
+database = Database.from_env()
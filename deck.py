@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import random
+from typing import NamedTuple
+
+from cards import bump_cards_version, cards_version
+from db import database as default_database, Database
+
+
+class Card(NamedTuple):
+    """
+    A single Tarot card as stored in the database.
+    """
+    card_id: int
+    name: str
+    description: str
+    url: str
+    file_id: str | None
+    table_name: str
+
+    @property
+    def photo(self) -> str:
+        """
+        The cached Telegram file id if the card was uploaded before, otherwise its URL.
+        """
+        return self.file_id or self.url
+
+
+class Spread(NamedTuple):
+    """
+    A drawn spread: one major arcana card followed by two minor arcana cards.
+    """
+    cards: tuple[Card, ...]
+
+    @property
+    def names(self) -> list[str]:
+        return [card.name for card in self.cards]
+
+
+class Deck:
+    """
+    In-memory copy of the `old_cards` and `new_cards` tables.
+
+    The tables are read once and kept as immutable tuples, so drawing a spread
+    is a pure memory operation that never blocks the event loop on disk.
+    A background watcher reloads the deck when the card tables change,
+    which is detected by the `cards_version` bumped with every write to them.
+    """
+
+    def __init__(self, database: Database = default_database, check_interval: float = 5.0):
+        """
+        Args:
+            database (Database): The database holding the card tables.
+            check_interval (float): Seconds between checks of the card tables for changes.
+        """
+        self.database = database
+        self.check_interval = check_interval
+        self.old_cards: tuple[Card, ...] = ()
+        self.new_cards: tuple[Card, ...] = ()
+        self._version: str | None = None
+        self._watcher: asyncio.Task | None = None
+
+    async def load(self):
+        """
+        Reads both card tables from the database into memory.
+        """
+        await self._reload(force=True)
+
+    async def _reload(self, force: bool = False):
+        try:
+            tables = await self.database.run(self._read_tables, force)
+        except Exception:
+            if force:
+                raise
+            logging.exception('Failed to reload the deck')
+            return
+        if tables is not None:
+            self.old_cards, self.new_cards, self._version = tables
+
+    def _read_tables(self, conn, force: bool):
+        version = cards_version(conn)
+        if not force and version == self._version:
+            return None
+        return self._read_table(conn, 'old_cards'), self._read_table(conn, 'new_cards'), version
+
+    @staticmethod
+    def _read_table(conn, table_name: str) -> tuple[Card, ...]:
+        cursor = conn.execute(f"SELECT * FROM {table_name} ORDER BY card_id")
+        return tuple(Card(*row[:5], table_name) for row in cursor.fetchall())
+
+    async def reload_if_changed(self):
+        """
+        Reloads the deck if the card tables changed since the last load;
+        spreads are drawn from the current copy meanwhile.
+        """
+        await self._reload()
+
+    def start(self):
+        """
+        Starts checking the card tables for changes every `check_interval` seconds.
+        """
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        """
+        Stops checking the card tables for changes.
+        """
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.reload_if_changed()
+
+    def find(self, name: str) -> Card | None:
+        """
+        Looks up a card by name.
+
+        Args:
+            name (str): The card name.
+
+        Returns:
+            Card | None: The card, or None if it is not in the deck.
+        """
+        for card in self.old_cards + self.new_cards:
+            if card.name == name:
+                return card
+        return None
+
+    async def remember_file_id(self, card: Card, file_id: str):
+        """
+        Stores the Telegram file id returned for a card's first upload,
+        both in memory and next to the card in the database.
+
+        Args:
+            card (Card): The uploaded card.
+            file_id (str): The file id Telegram assigned to the photo.
+        """
+        if card.file_id == file_id:
+            return
+        updated = card._replace(file_id=file_id)
+        if card.table_name == 'old_cards':
+            self.old_cards = tuple(updated if c.card_id == card.card_id else c for c in self.old_cards)
+        else:
+            self.new_cards = tuple(updated if c.card_id == card.card_id else c for c in self.new_cards)
+        await self.database.run(self._store_file_id, updated, write=True)
+
+    @staticmethod
+    def _store_file_id(conn, card: Card):
+        conn.execute(f"UPDATE {card.table_name} SET file_id = ? WHERE card_id = ?",
+                     (card.file_id, card.card_id))
+        bump_cards_version(conn)
+
+    def draw_spread(self, rng: random.Random | None = None) -> Spread:
+        """
+        Draws one card from `old_cards` and two distinct cards from `new_cards`.
+        Only reads the in-memory copy, so it also works outside an event loop.
+
+        Args:
+            rng (random.Random | None): Random generator to use, mostly useful
+                for reproducible draws.
+
+        Returns:
+            Spread: The drawn cards.
+        """
+        rng = rng or random
+        return Spread((rng.choice(self.old_cards), *rng.sample(self.new_cards, 2)))
+
+
+deck = Deck()
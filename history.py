@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import os
+import time
+from typing import NamedTuple
+
+from dotenv import load_dotenv
+
+from db import database as default_database, Database
+
+load_dotenv()
+
+
+class HistoryEntry(NamedTuple):
+    """
+    A spread a user got, as stored in the `spread_history` table.
+    """
+    entry_id: int
+    cards: list[str]
+    interpretation: str
+    created_at: float
+
+
+class SpreadHistory:
+    """
+    Per-user history of spreads and their interpretations.
+
+    Spreads are recorded into an in-memory write-behind buffer, so handlers
+    never wait for the disk. The buffer is written to the `spread_history`
+    table in one batch once it holds `batch_size` spreads, every
+    `flush_interval` seconds and on shutdown.
+    """
+
+    def __init__(self, database: Database = default_database, batch_size: int = 100,
+                 flush_interval: float = 2.0, max_buffer: int = 10000, page_size: int = 5):
+        """
+        Args:
+            database (Database): The database holding the `spread_history` table.
+            batch_size (int): Number of buffered spreads that triggers a flush.
+            flush_interval (float): Maximum number of seconds a spread stays buffered.
+            max_buffer (int): Maximum number of buffered spreads; the oldest ones
+                are dropped if the database can't keep up.
+            page_size (int): Number of spreads shown per page of /history.
+        """
+        self.database = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.page_size = page_size
+        self._buffer: list[tuple[int, str, str, str, float]] = []
+        self._full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flusher: asyncio.Task | None = None
+        self._closing = False
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+
+    @classmethod
+    def from_env(cls) -> 'SpreadHistory':
+        """
+        Creates a history configured by the `HISTORY_*` environment variables.
+        """
+        return cls(
+            batch_size=int(os.getenv('HISTORY_BATCH_SIZE', 100)),
+            flush_interval=float(os.getenv('HISTORY_FLUSH_INTERVAL', 2.0)),
+            max_buffer=int(os.getenv('HISTORY_MAX_BUFFER', 10000)),
+            page_size=int(os.getenv('HISTORY_PAGE_SIZE', 5)),
+        )
+
+    async def init(self):
+        """
+        Creates the `spread_history` table and starts the background flusher.
+        """
+        await self.database.run(self._create_table, write=True)
+        self._flusher = asyncio.create_task(self._flush_periodically())
+
+    @staticmethod
+    def _create_table(conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS spread_history (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                cards TEXT NOT NULL,
+                card_key TEXT NOT NULL,
+                interpretation TEXT,
+                created_at REAL NOT NULL
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS spread_history_user ON spread_history (user_id, id DESC)")
+        conn.execute("CREATE INDEX IF NOT EXISTS spread_history_card_key ON spread_history (card_key)")
+
+    def record(self, user_id: int, cards: list[str], interpretation: str):
+        """
+        Buffers a spread a user got; it is written to the database in the next batch.
+
+        Args:
+            user_id (int): The Telegram user id.
+            cards (list[str]): The card names in the order they were drawn.
+            interpretation (str): The interpretation the user got.
+        """
+        self._buffer.append((user_id, '|'.join(cards), '|'.join(sorted(cards)), interpretation, time.time()))
+        self.recorded += 1
+        overflow = len(self._buffer) - self.max_buffer
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self.dropped += overflow
+        if len(self._buffer) >= self.batch_size:
+            self._full.set()
+
+    async def _flush_periodically(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logging.exception('Failed to write the spread history')
+
+    async def flush(self):
+        """
+        Writes all buffered spreads in one transaction, after a batch that is
+        being written already. They are put back into the buffer if the write fails.
+        """
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            try:
+                await self.database.write_many('''
+                    INSERT INTO spread_history (user_id, cards, card_key, interpretation, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', batch)
+            except Exception:
+                self._buffer[:0] = batch[-self.max_buffer:]
+                raise
+            self.written += len(batch)
+            self.flushes += 1
+
+    async def close(self):
+        """
+        Stops the background flusher and writes the remaining buffered spreads.
+        """
+        self._closing = True
+        self._full.set()
+        if self._flusher is not None:
+            await self._flusher
+            self._flusher = None
+        await self.flush()
+
+    async def page(self, user_id: int, before_id: int | None = None) -> tuple[list[HistoryEntry], bool]:
+        """
+        Returns a page of a user's spreads, newest first.
+
+        Pages are selected by the id of the last shown spread rather than
+        by offset, so every page is one range scan of the (user_id, id) index
+        regardless of the history length.
+
+        Args:
+            user_id (int): The Telegram user id.
+            before_id (int | None): Return spreads older than this one,
+                or the newest spreads if None.
+
+        Returns:
+            tuple[list[HistoryEntry], bool]: The spreads and whether older ones exist.
+        """
+        if self._flush_lock.locked() or any(item[0] == user_id for item in self._buffer):
+            # The user's latest spreads may be buffered or in a batch being written.
+            await self.flush()
+        rows = await self.database.fetchall('''
+            SELECT id, cards, interpretation, created_at FROM spread_history
+            WHERE user_id = ? AND id < ?
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (user_id, before_id if before_id is not None else 2 ** 63 - 1, self.page_size + 1))
+        entries = [HistoryEntry(entry_id, cards.split('|'), interpretation, created_at)
+                   for entry_id, cards, interpretation, created_at in rows[:self.page_size]]
+        return entries, len(rows) > self.page_size
+
+    async def popular(self, limit: int = 10) -> list[tuple[list[str], int]]:
+        """
+        Returns the card combinations drawn most often, regardless of card order.
+
+        Args:
+            limit (int): Maximum number of combinations.
+
+        Returns:
+            list[tuple[list[str], int]]: The card names and how many times they were drawn.
+        """
+        rows = await self.database.fetchall('''
+            SELECT card_key, COUNT(*) AS spreads FROM spread_history
+            GROUP BY card_key
+            ORDER BY spreads DESC
+            LIMIT ?
+        ''', (limit,))
+        return [(card_key.split('|'), spreads) for card_key, spreads in rows]
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the recorded, written and dropped counters, the number of flushes
+        and the number of buffered spreads.
+        """
+        return {
+            'recorded': self.recorded,
+            'written': self.written,
+            'dropped': self.dropped,
+            'flushes': self.flushes,
+            'buffered': len(self._buffer),
+        }
+
+
+history = SpreadHistory.from_env()
@@ -0,0 +1,177 @@
+import os
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from db import database as default_database, Database
+
+load_dotenv()
+
+
+class InterpretationCache:
+    """
+    Two-tier cache of interpretations keyed by the normalized card set.
+
+    The first tier is a bounded in-memory LRU, the second one is the
+    `interpretations` table in the database. Every key holds up to `variants`
+    texts; lookups are served as soon as one exists and rotate between the
+    available ones, so repeated spreads don't always get identical answers.
+    The missing variants are filled in lazily by the caller, see `incomplete()`.
+    """
+
+    def __init__(self, database: Database = default_database, max_size: int = 10000,
+                 ttl: float = 7 * 24 * 3600, variants: int = 3):
+        """
+        Args:
+            database (Database): The database holding the `interpretations` table.
+            max_size (int): Maximum number of keys kept in memory.
+            ttl (float): Seconds an interpretation stays valid.
+            variants (int): Number of interpretations kept per card set.
+        """
+        self.database = database
+        self.max_size = max_size
+        self.ttl = ttl
+        self.variants = variants
+        self._entries: OrderedDict[str, list[tuple[int, str, float]]] = OrderedDict()
+        self._rotation: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> 'InterpretationCache':
+        """
+        Creates a cache configured by the `INTERPRETATION_*` environment variables.
+        """
+        return cls(
+            max_size=int(os.getenv('INTERPRETATION_CACHE_SIZE', 10000)),
+            ttl=float(os.getenv('INTERPRETATION_CACHE_TTL', 7 * 24 * 3600)),
+            variants=int(os.getenv('INTERPRETATION_VARIANTS', 3)),
+        )
+
+    @staticmethod
+    def card_key(cards: list[str]) -> str:
+        """
+        Builds a cache key that doesn't depend on the order of the cards.
+
+        Args:
+            cards (list[str]): List of card names.
+
+        Returns:
+            str: The normalized key.
+        """
+        return '|'.join(sorted(cards))
+
+    async def init(self):
+        """
+        Creates the `interpretations` table and drops expired rows.
+        """
+        await self.database.run(self._create_table, write=True)
+
+    def _create_table(self, conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS interpretations (
+                card_key TEXT,
+                variant INTEGER,
+                text TEXT,
+                created_at REAL,
+                PRIMARY KEY (card_key, variant)
+            )
+        ''')
+        conn.execute("DELETE FROM interpretations WHERE created_at < ?", (time.time() - self.ttl,))
+
+    def _remember(self, key: str, entry: list[tuple[int, str, float]]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            evicted, _ = self._entries.popitem(last=False)
+            self._rotation.pop(evicted, None)
+            self.evictions += 1
+
+    async def _entry(self, key: str) -> list[tuple[int, str, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = await self.database.fetchall(
+                "SELECT variant, text, created_at FROM interpretations "
+                "WHERE card_key = ? AND created_at >= ? ORDER BY variant",
+                (key, time.time() - self.ttl))
+        expires_before = time.time() - self.ttl
+        entry = [variant for variant in entry if variant[2] >= expires_before]
+        if entry:
+            self._remember(key, entry)
+        else:
+            # Misses don't take a slot, so they never evict cached interpretations.
+            self._entries.pop(key, None)
+            self._rotation.pop(key, None)
+        return entry
+
+    async def get(self, cards: list[str]) -> str | None:
+        """
+        Returns a cached interpretation, or None if the card set has none yet.
+        Lookups rotate between the variants generated so far.
+
+        Args:
+            cards (list[str]): List of card names.
+
+        Returns:
+            str | None: The interpretation text.
+        """
+        key = self.card_key(cards)
+        entry = await self._entry(key)
+        if not entry:
+            self.misses += 1
+            return None
+        self.hits += 1
+        index = self._rotation.get(key, 0) % len(entry)
+        self._rotation[key] = index + 1
+        return entry[index][1]
+
+    def incomplete(self, cards: list[str]) -> bool:
+        """
+        Returns True if the card set is cached in memory with fewer than `variants` texts.
+
+        Args:
+            cards (list[str]): List of card names.
+        """
+        entry = self._entries.get(self.card_key(cards))
+        return entry is not None and len(entry) < self.variants
+
+    async def put(self, cards: list[str], text: str):
+        """
+        Stores a freshly generated interpretation, replacing the oldest
+        variant if the card set already has all of them.
+
+        Args:
+            cards (list[str]): List of card names.
+            text (str): The interpretation text.
+        """
+        key = self.card_key(cards)
+        entry = await self._entry(key)
+        used = {variant for variant, _, _ in entry}
+        free = [variant for variant in range(self.variants) if variant not in used]
+        if free:
+            variant = free[0]
+        else:
+            variant = min(entry, key=lambda item: item[2])[0]
+        created_at = time.time()
+        entry = sorted([item for item in entry if item[0] != variant] + [(variant, text, created_at)])
+        self._remember(key, entry)
+        await self.database.write(
+            "INSERT OR REPLACE INTO interpretations (card_key, variant, text, created_at) "
+            "VALUES (?, ?, ?, ?)",
+            (key, variant, text, created_at))
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the hit, miss and eviction counters and the number of cached keys.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+        }
+
+
+interpretation_cache = InterpretationCache.from_env()
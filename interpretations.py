@@ -0,0 +1,219 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable
+
+from API import get_gpt_interpretation, stream_gpt_interpretation
+from circuit_breaker import breaker, CircuitOpen
+from deck import deck
+from interpretation_cache import interpretation_cache, InterpretationCache
+from metrics import fallbacks_total, truncated_total
+from scheduler import scheduler, SchedulerBusy, BACKGROUND_PRIORITY
+from singleflight import SingleFlight
+
+flights = SingleFlight()
+_fills: set[asyncio.Task] = set()
+_stores: set[asyncio.Task] = set()
+
+
+def _background(tasks: set[asyncio.Task], coro: Awaitable, failure: str):
+    task = asyncio.create_task(coro)
+    tasks.add(task)
+    task.add_done_callback(lambda done: _background_done(tasks, done, failure))
+
+
+def _background_done(tasks: set[asyncio.Task], task: asyncio.Task, failure: str):
+    tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logging.warning('%s: %r', failure, task.exception())
+
+
+def _store(cards: list[str], interpretation: str):
+    # Caching is best-effort: the answer never waits for the database commit.
+    _background(_stores, interpretation_cache.put(cards, interpretation), 'Failed to cache an interpretation')
+
+
+async def drain():
+    """
+    Waits until the interpretations generated so far are written to the cache.
+    """
+    if _stores:
+        await asyncio.gather(*_stores, return_exceptions=True)
+
+
+async def _generate(cards: list[str], priority: int = 0) -> str:
+    interpretation = await scheduler.run(
+        lambda: breaker.call(lambda: get_gpt_interpretation(cards)), priority)
+    _store(cards, interpretation)
+    return interpretation
+
+
+async def _generate_streamed(cards: list[str]) -> AsyncIterator[str]:
+    interpretation = ''
+    async with scheduler.slot():
+        async for interpretation in breaker.stream(lambda: stream_gpt_interpretation(cards)):
+            yield interpretation
+    if interpretation:
+        _store(cards, interpretation)
+
+
+async def _report_position(key: str, on_queued: Callable[[int], Awaitable] | None):
+    # Callers joining a flight don't take a place in the queue.
+    if flights.joins(key):
+        return
+    position = scheduler.position()
+    if on_queued is not None and position:
+        await on_queued(position)
+
+
+def _fill_variants(cards: list[str]):
+    # Cached card sets are served at once; their other variants are generated
+    # in the background, only while the upstream has capacity to spare.
+    if (not interpretation_cache.incomplete(cards) or breaker.is_open()
+            or not scheduler.idle(scheduler.max_concurrency // 2)):
+        return
+    key = InterpretationCache.card_key(cards)
+    _background(_fills, flights.do(key, lambda: _generate(cards, BACKGROUND_PRIORITY)),
+                'Failed to generate another interpretation variant')
+
+
+def local_interpretation(cards: list[str]) -> str:
+    """
+    Composes an interpretation from the card descriptions stored in the deck,
+    without calling the Yandex API.
+
+    Args:
+        cards (list[str]): List of card names, the major arcana card first.
+
+    Returns:
+        str: The interpretation text.
+    """
+    meanings = []
+    for name in cards:
+        card = deck.find(name)
+        description = card.description if card is not None else ''
+        meanings.append(f"{name} — {description or 'смысл каждый находит сам.'}")
+    main, *others = meanings
+    lines = ['Духи нейросети сейчас заняты, поэтому расклад толкую по старинке.', '',
+             f'В центре расклада {main}']
+    if others:
+        lines += ['', 'Рядом с ней:', *others]
+    lines += ['', 'Сложите эти значения вместе — и судьба станет чуть понятнее.']
+    return '\n'.join(lines)
+
+
+def _fallback(cards: list[str], error: Exception) -> str:
+    if isinstance(error, CircuitOpen):
+        reason = 'open'
+    elif isinstance(error, TimeoutError):
+        reason = 'timeout'
+    else:
+        reason = 'error'
+        logging.warning('Interpretation failed, answering locally: %r', error)
+    fallbacks_total.inc(reason)
+    return local_interpretation(cards)
+
+
+async def get_interpretation(cards: list[str], on_queued: Callable[[int], Awaitable] | None = None,
+                             priority: int = 0, fallback: bool = True) -> str:
+    """
+    Returns an interpretation of a spread from the cache, or generates one.
+    Concurrent requests for the same card set share one upstream call.
+
+    With `fallback`, the answer comes within the breaker budget: if the upstream
+    is failing, too slow or the breaker is open, a local interpretation
+    built from the card descriptions is returned instead.
+
+    Args:
+        cards (list[str]): List of card names to interpret.
+        on_queued (Callable[[int], Awaitable] | None): Called with the queue
+            position if this request starts an upstream call that has to wait
+            for the scheduler; not called when it joins one already in flight.
+        priority (int): Scheduler priority of the upstream call, lower values are served first.
+        fallback (bool): Answer locally instead of raising when the upstream fails.
+
+    Returns:
+        str: The interpretation text.
+
+    Raises:
+        SchedulerBusy: If the scheduler queue is full.
+    """
+    interpretation = await interpretation_cache.get(cards)
+    if interpretation is not None:
+        _fill_variants(cards)
+        return interpretation
+    if fallback and breaker.is_open():
+        return _fallback(cards, CircuitOpen())
+    key = InterpretationCache.card_key(cards)
+    await _report_position(key, on_queued)
+    generation = flights.do(key, lambda: _generate(cards, priority))
+    if not fallback:
+        return await generation
+    try:
+        # The shared call keeps running past the budget and still fills the cache.
+        return await asyncio.wait_for(generation, breaker.budget)
+    except SchedulerBusy:
+        raise
+    except Exception as e:
+        return _fallback(cards, e)
+
+
+async def stream_interpretation(cards: list[str],
+                                on_queued: Callable[[int], Awaitable] | None = None) -> AsyncIterator[str]:
+    """
+    Streams an interpretation of a spread, yielding the text generated so far.
+    Cached interpretations are yielded at once, and concurrent requests
+    for the same card set share one upstream stream.
+
+    The whole stream must finish within the breaker budget. If it doesn't
+    or fails, the text received so far is ended with an ellipsis; if nothing
+    arrived or the breaker is open, a local interpretation built from
+    the card descriptions is yielded instead.
+
+    Args:
+        cards (list[str]): List of card names to interpret.
+        on_queued (Callable[[int], Awaitable] | None): Called with the queue
+            position if this request starts an upstream call that has to wait
+            for the scheduler; not called when it joins one already in flight.
+
+    Yields:
+        str: The interpretation text generated so far.
+
+    Raises:
+        SchedulerBusy: If the scheduler queue is full.
+    """
+    interpretation = await interpretation_cache.get(cards)
+    if interpretation is not None:
+        _fill_variants(cards)
+        yield interpretation
+        return
+    if breaker.is_open():
+        yield _fallback(cards, CircuitOpen())
+        return
+    key = InterpretationCache.card_key(cards)
+    await _report_position(key, on_queued)
+    stream = flights.stream(key, lambda: _generate_streamed(cards))
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + breaker.budget
+    received = False
+    try:
+        while True:
+            try:
+                interpretation = await asyncio.wait_for(anext(stream), max(0.0, deadline - loop.time()))
+            except StopAsyncIteration:
+                break
+            received = True
+            yield interpretation
+        if not received:
+            raise ValueError('The interpretation stream ended without text')
+    except SchedulerBusy:
+        raise
+    except Exception as e:
+        if not received:
+            yield _fallback(cards, e)
+        else:
+            # Keep the real answer shown so far rather than replacing it with a canned one.
+            logging.warning('Interpretation stream cut short: %r', e)
+            truncated_total.inc()
+            yield interpretation.rstrip() + '…'
+    finally:
+        await stream.aclose()
@@ -0,0 +1,198 @@
+import bisect
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stage durations of the update being handled, collected for the structured log line.
+request_stages: contextvars.ContextVar[dict[str, float] | None] = contextvars.ContextVar(
+    'request_stages', default=None)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """
+    Monotonically increasing value, one per combination of label values.
+    """
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in self.values.items():
+            yield f'{self.name}{_format_labels(self.labels, labels)} {value}'
+
+
+class Histogram:
+    """
+    Distribution of observed values over fixed buckets, one per combination of label values.
+    """
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, *labels: str):
+        """
+        Observes the duration of the `with` block; it is also added to the
+        stages of the update being handled.
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started_at
+            self.observe(duration, *labels)
+            stages = request_stages.get()
+            if stages is not None and labels:
+                stages[labels[0]] = stages.get(labels[0], 0) + duration
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += bucket_count
+                bucket = _format_labels(self.labels, labels, f'le="{bound}"')
+                yield f'{self.name}_bucket{bucket} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labels, labels)} {total}'
+            yield f'{self.name}_count{_format_labels(self.labels, labels)} {count}'
+
+
+class Registry:
+    """
+    Collection of metrics rendered in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self.metrics: list[Counter | Histogram] = []
+        self.collectors: list[tuple[str, Callable[[], dict[str, float]]]] = []
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def collect(self, prefix: str, stats: Callable[[], dict[str, float]]):
+        """
+        Exposes the values returned by `stats` as gauges named `<prefix>_<key>`.
+
+        Args:
+            prefix (str): The metric name prefix.
+            stats (Callable[[], dict[str, float]]): Returns the current values.
+        """
+        self.collectors.append((prefix, stats))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for prefix, stats in self.collectors:
+            for key, value in stats().items():
+                lines.append(f'# TYPE {prefix}_{key} gauge')
+                lines.append(f'{prefix}_{key} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+updates_total = registry.counter(
+    'bot_updates_total', 'Handled updates.', ('handler',))
+update_seconds = registry.histogram(
+    'bot_update_seconds', 'Time spent handling an update.', ('handler',))
+errors_total = registry.counter(
+    'bot_errors_total', 'Errors reported to users, by exception type.', ('type',))
+stage_seconds = registry.histogram(
+    'tarot_stage_seconds', 'Time spent in a stage of a spread.', ('stage',))
+upstream_responses_total = registry.counter(
+    'yandex_responses_total', 'Responses of the Yandex API, by status code.', ('status',))
+tokens_total = registry.counter(
+    'yandex_tokens_total', 'Tokens used by the Yandex API.', ('kind',))
+fallbacks_total = registry.counter(
+    'tarot_fallbacks_total', 'Interpretations composed locally instead of by the Yandex API, by reason.',
+    ('reason',))
+truncated_total = registry.counter(
+    'tarot_truncated_total', 'Streamed interpretations cut short by the budget or an upstream error.')
+
+METRICS_LOG = os.getenv('METRICS_LOG') == '1'
+
+
+def record_usage(result: dict):
+    """
+    Counts the tokens reported in a Yandex completion response.
+
+    Args:
+        result (dict): The decoded response.
+    """
+    usage = result.get('result', {}).get('usage', {})
+    for kind in ('inputTextTokens', 'completionTokens'):
+        if kind in usage:
+            tokens_total.inc(kind, amount=int(usage[kind]))
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    """
+    Serves all metrics in the Prometheus text format.
+    """
+    return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """
+    Serves `/metrics` on its own port, apart from the public webhook server.
+
+    Args:
+        host (str): The interface to listen on.
+        port (int): The port to listen on.
+
+    Returns:
+        web.AppRunner: The runner, to be cleaned up on shutdown.
+    """
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from metrics import request_stages, updates_total, update_seconds, METRICS_LOG
+
+
+class InFlightMiddleware(BaseMiddleware):
+    """
+    Tracks the handlers that are currently processing updates,
+    so that shutdown can wait for them to finish.
+    """
+
+    def __init__(self):
+        self.tasks: set[asyncio.Task] = set()
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any]
+    ) -> Any:
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        try:
+            return await handler(event, data)
+        finally:
+            self.tasks.discard(task)
+
+    async def drain(self, timeout: float):
+        """
+        Waits until all in-flight handlers finish, but no longer than `timeout` seconds.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait.
+        """
+        current = asyncio.current_task()
+        tasks = {task for task in self.tasks if task is not current}
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Counts and times handled updates and optionally writes
+    one structured log line per update with its stage durations.
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any]
+    ) -> Any:
+        handler_name = data['handler'].callback.__name__
+        stages = {}
+        token = request_stages.set(stages)
+        started_at = time.perf_counter()
+        status = 'ok'
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - started_at
+            request_stages.reset(token)
+            updates_total.inc(handler_name)
+            update_seconds.observe(duration, handler_name)
+            if METRICS_LOG:
+                user = data.get('event_from_user')
+                logging.info(json.dumps({
+                    'handler': handler_name,
+                    'user_id': user.id if user else None,
+                    'status': status,
+                    'duration': round(duration, 4),
+                    'stages': {stage: round(value, 4) for stage, value in stages.items()},
+                }))
@@ -1,22 +1,59 @@
+import argparse
 import asyncio
+import math
+import multiprocessing
 import os
+import signal
+import time
 import logging
 
 from dotenv import load_dotenv
 from aiogram import Bot, Dispatcher, F
-from aiogram.types import (Message, ReplyKeyboardMarkup, KeyboardButton)
+from aiogram.types import (Message, ReplyKeyboardMarkup, KeyboardButton, CallbackQuery,
+                           InlineKeyboardMarkup, InlineKeyboardButton)
 from aiogram.filters import CommandStart, Command
+from aiohttp import web
 
-from cards_random import get_random_cards
-from API import get_gpt_interpretation
+from cards_random import send_spread, warm_up_file_ids
+from API import yandex_client
 from cards import init_db
+from circuit_breaker import breaker
+from db import database
+from deck import deck
+from history import history, HistoryEntry
+from interpretation_cache import interpretation_cache
+from interpretations import get_interpretation, stream_interpretation, drain as drain_interpretations
+from metrics import registry, errors_total, stage_seconds, start_metrics_server
+from middlewares import InFlightMiddleware, MetricsMiddleware
+from scheduler import scheduler, SchedulerBusy
+from spread_pool import spread_pool
+from streaming import answer_streamed
+from webhook import create_webhook_app, register_webhook
 
 load_dotenv()
 
-init_db()
-
 bot = Bot(token=os.getenv('TOKEN'))
 dp = Dispatcher()
+inflight = InFlightMiddleware()
+dp.update.outer_middleware(inflight)
+metrics_middleware = MetricsMiddleware()
+dp.message.middleware(metrics_middleware)
+dp.callback_query.middleware(metrics_middleware)
+registry.collect('interpretation_cache', interpretation_cache.stats)
+registry.collect('db', database.stats)
+registry.collect('history', history.stats)
+registry.collect('spread_pool', spread_pool.stats)
+registry.collect('circuit_breaker', breaker.stats)
+registry.collect('scheduler', scheduler.stats)
+
+ADMIN_IDS = {int(user_id) for user_id in os.getenv('ADMIN_IDS', '').split(',') if user_id.strip()}
+WARMUP_CHAT_ID = os.getenv('WARMUP_CHAT_ID')
+SPREAD_DELIVERY = os.getenv('SPREAD_DELIVERY', 'album')
+INTERPRETATION_STREAM = os.getenv('INTERPRETATION_STREAM', '1') == '1'
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', 1.5))
+DRAIN_TIMEOUT = float(os.getenv('DRAIN_TIMEOUT', 30))
+METRICS_PORT = os.getenv('METRICS_PORT')
+HISTORY_EXCERPT = int(os.getenv('HISTORY_EXCERPT', 300))
 
 keyboard = ReplyKeyboardMarkup(keyboard=[
     [KeyboardButton(text='Получить расклад')]],
@@ -46,26 +83,284 @@ async def send_tarot_card(message: Message):
     Handles the /tarot command or button press,
     sending a Tarot card spread and its interpretation.
     """
-    try:
-        jpt = await get_random_cards(message)
+    user_id = message.from_user.id
+    wait = await scheduler.begin_user(user_id)
+    if wait == 0:
+        await message.answer('Ваш расклад уже готовится, подождите немного')
+        return
+    if wait is not None:
+        await message.answer(f'Следующий расклад можно получить через {math.ceil(wait)} сек.')
+        return
 
-        interpretation = await get_gpt_interpretation(jpt)
-        await message.answer(interpretation)
+    async def on_queued(position: int):
+        await message.answer(f'Много желающих узнать судьбу, вы в очереди: {position}')
+
+    try:
+        with stage_seconds.time('draw'):
+            pooled = spread_pool.pop()
+            spread = pooled[0] if pooled else deck.draw_spread()
+        send_task = asyncio.create_task(
+            send_spread(message, spread, album=SPREAD_DELIVERY == 'album'))
+        try:
+            with stage_seconds.time('interpretation'):
+                if pooled:
+                    interpretation = pooled[1]
+                    await send_task
+                    await message.answer(interpretation)
+                elif INTERPRETATION_STREAM:
+                    interpretation = await answer_streamed(
+                        message, stream_interpretation(spread.names, on_queued),
+                        min_interval=STREAM_EDIT_INTERVAL, after=send_task)
+                else:
+                    interpretation = await get_interpretation(spread.names, on_queued)
+                    await send_task
+                    await message.answer(interpretation)
+        finally:
+            send_task.cancel()
+        history.record(user_id, spread.names, interpretation)
 
+    except SchedulerBusy as e:
+        errors_total.inc(type(e).__name__)
+        await message.answer('Сейчас слишком много желающих узнать судьбу, попробуйте чуть позже')
     except Exception as e:
+        errors_total.inc(type(e).__name__)
         await message.answer(f"Произошла ошибка: {e}")
+    finally:
+        await scheduler.end_user(user_id)
+
+
+def format_history(entries: list[HistoryEntry], has_more: bool) -> tuple[str, InlineKeyboardMarkup | None]:
+    """
+    Renders a page of the spread history with a button for the older spreads.
+
+    Args:
+        entries (list[HistoryEntry]): The spreads, newest first.
+        has_more (bool): Whether older spreads exist.
+
+    Returns:
+        tuple[str, InlineKeyboardMarkup | None]: The message text and its keyboard.
+    """
+    blocks = []
+    for entry in entries:
+        interpretation = entry.interpretation or ''
+        if len(interpretation) > HISTORY_EXCERPT:
+            interpretation = interpretation[:HISTORY_EXCERPT].rstrip() + '…'
+        date = time.strftime('%d.%m.%Y %H:%M', time.localtime(entry.created_at))
+        blocks.append(f"{date}\nКарты: {', '.join(entry.cards)}\n{interpretation}")
+    markup = None
+    if has_more:
+        markup = InlineKeyboardMarkup(inline_keyboard=[[
+            InlineKeyboardButton(text='Ранее', callback_data=f'history:{entries[-1].entry_id}')]])
+    return '\n\n'.join(blocks), markup
+
+
+@dp.message(Command('history'))
+async def cmd_history(message: Message):
+    """
+    Handles the /history command, showing the user's latest spreads.
+    """
+    entries, has_more = await history.page(message.from_user.id)
+    if not entries:
+        await message.answer('Вы еще не получали раскладов')
+        return
+    text, markup = format_history(entries, has_more)
+    await message.answer(text, reply_markup=markup)
+
+
+@dp.callback_query(F.data.startswith('history:'))
+async def history_earlier(callback: CallbackQuery):
+    """
+    Handles the "Ранее" button of /history, showing the next page of older spreads.
+    """
+    before_id = int(callback.data.split(':', 1)[1])
+    entries, has_more = await history.page(callback.from_user.id, before_id)
+    await callback.answer()
+    if entries:
+        text, markup = format_history(entries, has_more)
+        await callback.message.answer(text, reply_markup=markup)
+
+
+@dp.message(Command('popular'), F.from_user.id.in_(ADMIN_IDS))
+async def cmd_popular(message: Message):
+    """
+    Handles the /popular command, showing the most frequently drawn card combinations.
+    """
+    combinations = await history.popular()
+    if not combinations:
+        await message.answer('Раскладов пока нет')
+        return
+    await message.answer('\n'.join(f"{count}: {', '.join(cards)}" for cards, count in combinations))
+
+
+@dp.message(Command('warmup'), F.from_user.id.in_(ADMIN_IDS))
+async def cmd_warmup(message: Message):
+    """
+    Handles the /warmup command, pre-uploading all card images
+    to the service chat so that spreads are sent by cached file id.
+    """
+    chat_id = WARMUP_CHAT_ID or message.chat.id
+    await message.answer('Загружаю карты...')
+    uploaded = await warm_up_file_ids(bot, chat_id)
+    await message.answer(f'Готово, загружено карт: {uploaded}')
+
+
+@dp.message(Command('stats'), F.from_user.id.in_(ADMIN_IDS))
+async def cmd_stats(message: Message):
+    """
+    Handles the /stats command, showing the interpretation cache, scheduler and spread pool counters.
+    """
+    stats = {
+        **{f'cache_{name}': value for name, value in interpretation_cache.stats().items()},
+        **{f'scheduler_{name}': value for name, value in scheduler.stats().items()},
+        **{f'pool_{name}': value for name, value in spread_pool.stats().items()},
+    }
+    await message.answer('\n'.join(f'{name}: {value}' for name, value in stats.items()))
+
+
+@dp.startup()
+async def on_startup():
+    """
+    Seeds the database, loads the deck and starts watching it for changes,
+    opens the pooled HTTP client for the Yandex API and starts filling the pool of ready spreads.
+    """
+    await database.run(init_db, write=True)
+    await deck.load()
+    deck.start()
+    await interpretation_cache.init()
+    await history.init()
+    await yandex_client.start()
+    spread_pool.start()
+
+
+@dp.shutdown()
+async def on_shutdown():
+    """
+    Stops filling the pool of ready spreads, waits for in-flight handlers,
+    stops watching the deck, closes the pooled HTTP client for the Yandex API,
+    writes the buffered spread history and interpretations and commits
+    the queued database writes.
+    """
+    await spread_pool.stop()
+    await inflight.drain(DRAIN_TIMEOUT)
+    await deck.stop()
+    await yandex_client.close()
+    await drain_interpretations()
+    await history.close()
+    await database.close()
 
 
 async def main():
     """
     Starts the bot and begins polling for messages.
+    If `METRICS_PORT` is set, the metrics are served on it.
     """
-    await dp.start_polling(bot)
+    metrics_runner = None
+    if METRICS_PORT:
+        metrics_runner = await start_metrics_server(os.getenv('METRICS_HOST', '0.0.0.0'), int(METRICS_PORT))
+    try:
+        await dp.start_polling(bot)
+    finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+
+
+def run_webhook(args: argparse.Namespace, worker: bool = False, metrics_port: int | None = None):
+    """
+    Starts the bot as a webhook server.
+    The metrics are never served by the public webhook server, only on `metrics_port`.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+        worker (bool): Whether this is one of several worker processes sharing
+            the port; the webhook is then registered by the parent process.
+        metrics_port (int | None): The port to serve the metrics on, if any.
+    """
+    app = create_webhook_app(
+        dp, bot, inflight,
+        path=args.path,
+        base_url=None if worker else os.getenv('WEBHOOK_URL'),
+        secret=os.getenv('WEBHOOK_SECRET'),
+        drain_timeout=DRAIN_TIMEOUT,
+    )
+    if metrics_port is not None:
+        async def metrics_server(_: web.Application):
+            runner = await start_metrics_server(os.getenv('METRICS_HOST', '0.0.0.0'), metrics_port)
+            yield
+            await runner.cleanup()
+
+        app.cleanup_ctx.append(metrics_server)
+    web.run_app(app, host=args.host, port=args.port, reuse_port=worker)
+
+
+def run_worker(args: argparse.Namespace, number: int):
+    """
+    Entry point of a worker process. With `METRICS_PORT` set, worker `number`
+    serves its metrics on `METRICS_PORT + number`.
+    """
+    logging.basicConfig(level=logging.INFO)
+    run_webhook(args, worker=True, metrics_port=int(METRICS_PORT) + number if METRICS_PORT else None)
+
+
+async def set_webhook(args: argparse.Namespace):
+    """
+    Registers the webhook once on behalf of all workers.
+    """
+    webhook_url = os.getenv('WEBHOOK_URL')
+    if webhook_url:
+        await register_webhook(bot, webhook_url, args.path, os.getenv('WEBHOOK_SECRET'))
+    await bot.session.close()
+
+
+def run_workers(args: argparse.Namespace):
+    """
+    Starts several webhook worker processes listening on the same port,
+    so the kernel spreads incoming updates between them.
+    Shared state lives in the database, see `state.py`.
+    """
+    os.environ['WORKERS'] = str(args.workers)
+    asyncio.run(set_webhook(args))
+
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(target=run_worker, args=(args, number), name=f'worker-{number}')
+        for number in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def stop(*_):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for process in processes:
+        process.join()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Telegram tarolog bot')
+    parser.add_argument('--mode', choices=('polling', 'webhook'), default=os.getenv('BOT_MODE', 'polling'))
+    parser.add_argument('--host', default=os.getenv('WEBHOOK_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('WEBHOOK_PORT', 8080)))
+    parser.add_argument('--path', default=os.getenv('WEBHOOK_PATH', '/webhook'))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WORKERS', 1)))
+    args = parser.parse_args()
+    if args.workers > 1 and args.mode != 'webhook':
+        parser.error('several workers need the webhook mode')
+    return args
 
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
-    try:
-        asyncio.run(main())
-    except KeyboardInterrupt:
-        print('exit')
\ No newline at end of file
+    args = parse_args()
+    if args.workers > 1:
+        run_workers(args)
+    elif args.mode == 'webhook':
+        run_webhook(args, metrics_port=int(METRICS_PORT) if METRICS_PORT else None)
+    else:
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            print('exit')
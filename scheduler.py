@@ -0,0 +1,261 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable
+
+from dotenv import load_dotenv
+
+from state import StateBackend, MemoryStateBackend, state_backend_from_env
+
+load_dotenv()
+
+# Priority of background generation; users (priority 0) are always served first.
+BACKGROUND_PRIORITY = 10
+
+
+class SchedulerBusy(Exception):
+    """
+    Raised when the LLM work queue is full.
+    """
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the rate of upstream API requests.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate (float): Tokens added per second.
+            capacity (float): Maximum number of tokens, i.e. the allowed burst.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """
+        Waits until a token is available and takes it.
+        """
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class Scheduler:
+    """
+    Limits the load put on the Yandex API.
+
+    Upstream calls run inside `slot()`: at most `max_concurrency` of them at once,
+    started no faster than the token bucket allows. Callers beyond that wait in
+    a bounded priority queue; when it is full, `SchedulerBusy` is raised.
+    Per-user bookkeeping collapses repeated presses while a spread is pending
+    and enforces a cooldown between spreads.
+    """
+
+    def __init__(self, max_concurrency: int = 20, max_queue: int = 200,
+                 rate: float = 10.0, burst: float = 10.0, user_cooldown: float = 5.0,
+                 state: StateBackend | None = None, pending_ttl: float = 300.0):
+        """
+        The concurrency, queue and rate limits apply to one process; per-user
+        state lives in `state`, so it is shared by every worker using the same backend.
+
+        Args:
+            max_concurrency (int): Maximum number of simultaneous upstream calls.
+            max_queue (int): Maximum number of callers waiting for a slot.
+            rate (float): Upstream requests allowed per second.
+            burst (float): Upstream requests allowed at once after an idle period.
+            user_cooldown (float): Minimum number of seconds between two spreads of a user.
+            state (StateBackend | None): Where pending spreads and cooldowns are kept,
+                in-process memory by default.
+            pending_ttl (float): Seconds after which a pending spread of a crashed
+                worker stops blocking the user.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.bucket = TokenBucket(rate, burst)
+        self.user_cooldown = user_cooldown
+        self.state = state or MemoryStateBackend()
+        self.pending_ttl = pending_ttl
+        self._active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self.processed = 0
+        self.rejected = 0
+        self.collapsed = 0
+        self.throttled = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @classmethod
+    def from_env(cls) -> 'Scheduler':
+        """
+        Creates a scheduler configured by the `LLM_*` and `USER_COOLDOWN` environment variables.
+        The limits are split evenly between `WORKERS` processes.
+        """
+        workers = max(1, int(os.getenv('WORKERS', 1)))
+        return cls(
+            max_concurrency=max(1, int(os.getenv('LLM_CONCURRENCY', 20)) // workers),
+            max_queue=max(1, int(os.getenv('LLM_QUEUE_SIZE', 200)) // workers),
+            rate=float(os.getenv('LLM_RATE', 10)) / workers,
+            burst=max(1.0, float(os.getenv('LLM_BURST', 10)) / workers),
+            user_cooldown=float(os.getenv('USER_COOLDOWN', 5)),
+            state=state_backend_from_env(),
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def busy(self) -> bool:
+        """
+        Returns True if a new upstream call would have to wait in the queue.
+        """
+        return self._active >= self.max_concurrency or bool(self._waiters)
+
+    def idle(self, reserve: int = 0) -> bool:
+        """
+        Returns True if nobody waits for a slot and more than `reserve` slots are free,
+        so that background work can run without delaying users.
+
+        Args:
+            reserve (int): Number of slots to keep free for users.
+        """
+        return not self._waiters and self.max_concurrency - self._active > reserve
+
+    def position(self) -> int:
+        """
+        Returns the queue position a new upstream call would get, or 0 if it would start at once.
+        """
+        return len(self._waiters) + 1 if self.busy() else 0
+
+    async def begin_user(self, user_id: int) -> float | None:
+        """
+        Marks a spread of the user as pending.
+
+        Args:
+            user_id (int): The Telegram user id.
+
+        Returns:
+            float | None: None if the spread may start, 0 if the user already
+                has a pending spread, otherwise the seconds left until the cooldown ends.
+        """
+        now = time.time()
+        started_at = await self.state.get(f'cooldown:{user_id}')
+        if started_at is not None and now - float(started_at) < self.user_cooldown:
+            if await self.state.get(f'pending:{user_id}') is not None:
+                self.collapsed += 1
+                return 0
+            self.throttled += 1
+            return float(started_at) + self.user_cooldown - now
+        if not await self.state.set_if_absent(f'pending:{user_id}', str(now), self.pending_ttl,
+                                              also={f'cooldown:{user_id}': (str(now), self.user_cooldown)}):
+            self.collapsed += 1
+            return 0
+        return None
+
+    async def end_user(self, user_id: int):
+        """
+        Marks the pending spread of the user as finished.
+
+        Args:
+            user_id (int): The Telegram user id.
+        """
+        await self.state.delete(f'pending:{user_id}')
+
+    @asynccontextmanager
+    async def slot(self, priority: int = 0):
+        """
+        Waits for permission to call the upstream API.
+
+        Args:
+            priority (int): Lower values are served first.
+
+        Raises:
+            SchedulerBusy: If the queue is full.
+        """
+        await self._acquire(priority)
+        try:
+            await self.bucket.acquire()
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: int):
+        enqueued_at = time.monotonic()
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+        else:
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise SchedulerBusy()
+            future = asyncio.get_running_loop().create_future()
+            entry = (priority, next(self._counter), future)
+            heapq.heappush(self._waiters, entry)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._release()
+                else:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                raise
+        wait = time.monotonic() - enqueued_at
+        self.processed += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+    def _release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    async def run(self, fn: Callable[[], Awaitable], priority: int = 0):
+        """
+        Runs an upstream call inside a slot.
+
+        Args:
+            fn (Callable[[], Awaitable]): Starts the upstream call.
+            priority (int): Lower values are served first.
+
+        Returns:
+            The result of the call.
+        """
+        async with self.slot(priority):
+            return await fn()
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns the queue depth, wait time and rejection counters.
+        """
+        return {
+            'queue_depth': self.queue_depth,
+            'active': self._active,
+            'processed': self.processed,
+            'rejected': self.rejected,
+            'collapsed': self.collapsed,
+            'throttled': self.throttled,
+            'wait_avg': round(self.wait_total / self.processed, 3) if self.processed else 0.0,
+            'wait_max': round(self.wait_max, 3),
+        }
+
+
+scheduler = Scheduler.from_env()
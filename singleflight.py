@@ -0,0 +1,133 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar('T')
+
+
+class _Broadcast:
+    """
+    Latest value of a shared stream, observed by any number of subscribers.
+    """
+
+    def __init__(self):
+        self.value = None
+        self.version = 0
+        self.done = False
+        self.error: BaseException | None = None
+        self.changed = asyncio.Condition()
+
+    async def publish(self, value):
+        async with self.changed:
+            self.value = value
+            self.version += 1
+            self.changed.notify_all()
+
+    async def finish(self, error: BaseException | None = None):
+        async with self.changed:
+            self.done = True
+            self.error = error
+            self.changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator:
+        seen = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: self.version != seen or self.done)
+                version, value = self.version, self.value
+                done, error = self.done, self.error
+            if version != seen:
+                seen = version
+                yield value
+            elif error is not None:
+                raise error
+            elif done:
+                return
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one upstream call.
+
+    The shared work runs in its own task, so cancelling one caller never
+    cancels it for the others; errors are propagated to every caller.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self._streams: dict[Hashable, _Broadcast] = {}
+        self._stream_tasks: set[asyncio.Task] = set()
+
+    def _forget(self, flights: dict, key: Hashable, flight):
+        if flights.get(key) is flight:
+            del flights[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs `fn` unless a call with the same key is already in flight,
+        and returns the shared result.
+
+        Args:
+            key (Hashable): The deduplication key.
+            fn (Callable[[], Awaitable[T]]): Starts the upstream call.
+
+        Returns:
+            T: The result of the shared call.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(self._calls, key, t))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return await asyncio.shield(task)
+
+    async def stream(self, key: Hashable, fn: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """
+        Runs the stream returned by `fn` unless a stream with the same key
+        is already in flight, and yields the shared values.
+
+        Every subscriber starts from the latest value, so the stream is expected
+        to yield cumulative values (e.g. the text generated so far).
+
+        Args:
+            key (Hashable): The deduplication key.
+            fn (Callable[[], AsyncIterator[T]]): Starts the upstream stream.
+
+        Yields:
+            T: The values of the shared stream.
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            task = asyncio.create_task(self._run_stream(key, broadcast, fn))
+            self._stream_tasks.add(task)
+            task.add_done_callback(self._stream_tasks.discard)
+        async for value in broadcast.subscribe():
+            yield value
+
+    async def _run_stream(self, key: Hashable, broadcast: _Broadcast, fn: Callable[[], AsyncIterator]):
+        error = None
+        try:
+            async for value in fn():
+                await broadcast.publish(value)
+        except BaseException as e:
+            error = e
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            self._forget(self._streams, key, broadcast)
+            await broadcast.finish(error)
+
+    def joins(self, key: Hashable) -> bool:
+        """
+        Returns True if a call or stream with this key is already in flight,
+        so a new caller would share it instead of starting one.
+        """
+        return key in self._calls or key in self._streams
+
+    def in_flight(self) -> int:
+        """
+        Returns the number of upstream calls and streams currently running.
+        """
+        return len(self._calls) + len(self._streams)
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import os
+from collections import deque
+
+from dotenv import load_dotenv
+
+from circuit_breaker import breaker
+from deck import deck, Spread
+from interpretations import get_interpretation
+from scheduler import scheduler, BACKGROUND_PRIORITY
+
+load_dotenv()
+
+
+class SpreadPool:
+    """
+    Bounded pool of spreads drawn and interpreted in advance.
+
+    A background producer keeps the pool topped up to `target_size`, generating
+    at most `refill_rate` spreads per second and only while the scheduler has
+    more than `reserve` free slots and the circuit breaker is closed, so it
+    uses idle upstream capacity only. Local fallback interpretations never
+    get into the pool.
+
+    Handlers take a ready spread with `pop()` and generate one live when the
+    pool is empty. The pool is disabled when `target_size` is 0.
+    """
+
+    def __init__(self, target_size: int = 0, refill_rate: float = 0.5, reserve: int | None = None,
+                 idle_interval: float = 1.0):
+        """
+        Args:
+            target_size (int): Number of ready spreads to keep, 0 disables the pool.
+            refill_rate (float): Maximum number of spreads generated per second.
+            reserve (int | None): Number of scheduler slots left to users;
+                half of the scheduler concurrency by default.
+            idle_interval (float): Seconds to wait before checking again
+                when the pool is full or the scheduler is busy.
+
+        Raises:
+            ValueError: If the pool is enabled with a refill rate that isn't positive.
+        """
+        if target_size > 0 and refill_rate <= 0:
+            raise ValueError(f'SPREAD_POOL_REFILL_RATE must be positive, got {refill_rate}')
+        self.target_size = target_size
+        self.refill_rate = refill_rate
+        self.reserve = scheduler.max_concurrency // 2 if reserve is None else reserve
+        self.idle_interval = idle_interval
+        self._spreads: deque[tuple[Spread, str]] = deque(maxlen=max(1, target_size))
+        self._producer: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+        self.produced = 0
+        self.failures = 0
+
+    @classmethod
+    def from_env(cls) -> 'SpreadPool':
+        """
+        Creates a pool configured by the `SPREAD_POOL_*` environment variables.
+        """
+        reserve = os.getenv('SPREAD_POOL_RESERVE')
+        return cls(
+            target_size=int(os.getenv('SPREAD_POOL_SIZE', 0)),
+            refill_rate=float(os.getenv('SPREAD_POOL_REFILL_RATE', 0.5)),
+            reserve=int(reserve) if reserve else None,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.target_size > 0
+
+    def start(self):
+        """
+        Starts the background producer if the pool is enabled.
+        """
+        if self.enabled and self._producer is None:
+            self._producer = asyncio.create_task(self._produce())
+
+    async def stop(self):
+        """
+        Stops the background producer.
+        """
+        if self._producer is not None:
+            self._producer.cancel()
+            await asyncio.gather(self._producer, return_exceptions=True)
+            self._producer = None
+
+    async def _produce(self):
+        while True:
+            if (len(self._spreads) >= self.target_size or not scheduler.idle(self.reserve)
+                    or breaker.is_open()):
+                await asyncio.sleep(self.idle_interval)
+                continue
+            try:
+                spread = deck.draw_spread()
+                interpretation = await get_interpretation(
+                    spread.names, priority=BACKGROUND_PRIORITY, fallback=False)
+            except Exception:
+                self.failures += 1
+                logging.exception('Failed to pre-generate a spread')
+                await asyncio.sleep(self.idle_interval)
+                continue
+            self._spreads.append((spread, interpretation))
+            self.produced += 1
+            await asyncio.sleep(1 / self.refill_rate)
+
+    def pop(self) -> tuple[Spread, str] | None:
+        """
+        Takes a ready spread and its interpretation from the pool.
+
+        Returns:
+            tuple[Spread, str] | None: The spread and its interpretation,
+                or None if the pool is empty or disabled.
+        """
+        if not self.enabled:
+            return None
+        if not self._spreads:
+            self.misses += 1
+            return None
+        self.hits += 1
+        spread, interpretation = self._spreads.popleft()
+        # File ids may have been cached since the spread was drawn.
+        return Spread(tuple(deck.find(card.name) or card for card in spread.cards)), interpretation
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns the pool size, hit and miss counters, the hit rate
+        and the number of produced and failed spreads.
+        """
+        requests = self.hits + self.misses
+        return {
+            'size': len(self._spreads),
+            'target_size': self.target_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / requests, 3) if requests else 0.0,
+            'produced': self.produced,
+            'failures': self.failures,
+        }
+
+
+spread_pool = SpreadPool.from_env()
@@ -0,0 +1,169 @@
+import os
+import time
+from abc import ABC, abstractmethod
+
+from dotenv import load_dotenv
+
+from db import database as default_database, Database
+
+load_dotenv()
+
+
+class StateBackend(ABC):
+    """
+    Key-value store for state shared between worker processes,
+    such as pending spreads and per-user cooldowns.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> str | None:
+        """
+        Returns the value of a key, or None if it is missing or expired.
+        """
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: float | None = None):
+        """
+        Sets the value of a key, optionally expiring after `ttl` seconds.
+        """
+
+    @abstractmethod
+    async def set_if_absent(self, key: str, value: str, ttl: float | None = None,
+                            also: dict[str, tuple[str, float | None]] | None = None) -> bool:
+        """
+        Sets the value of a key unless it already has one.
+
+        Args:
+            also (dict[str, tuple[str, float | None]] | None): Further keys with
+                their values and ttls, set in the same write if the value was set.
+
+        Returns:
+            bool: True if the value was set.
+        """
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """
+        Removes a key.
+        """
+
+
+class MemoryStateBackend(StateBackend):
+    """
+    In-process state backend, for a single worker and for tests.
+    """
+
+    def __init__(self):
+        self._values: dict[str, tuple[str, float | None]] = {}
+
+    def _get(self, key: str) -> str | None:
+        item = self._values.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.time():
+            del self._values[key]
+            return None
+        return value
+
+    async def get(self, key: str) -> str | None:
+        return self._get(key)
+
+    async def set(self, key: str, value: str, ttl: float | None = None):
+        self._values[key] = (value, time.time() + ttl if ttl is not None else None)
+
+    async def set_if_absent(self, key: str, value: str, ttl: float | None = None,
+                            also: dict[str, tuple[str, float | None]] | None = None) -> bool:
+        if self._get(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        for other_key, (other_value, other_ttl) in (also or {}).items():
+            await self.set(other_key, other_value, other_ttl)
+        return True
+
+    async def delete(self, key: str):
+        self._values.pop(key, None)
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    State backend stored in the `shared_state` table, shared by all worker
+    processes on the host. Queries go through the async data-access layer.
+    """
+
+    def __init__(self, database: Database = default_database):
+        """
+        Args:
+            database (Database): The database holding the `shared_state` table.
+        """
+        self.database = database
+        self._ready = False
+
+    @staticmethod
+    def _create_table(connection):
+        connection.execute('''
+            CREATE TABLE IF NOT EXISTS shared_state (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                expires_at REAL
+            )
+        ''')
+        connection.execute("DELETE FROM shared_state WHERE expires_at < ?", (time.time(),))
+
+    async def _ensure_table(self):
+        if not self._ready:
+            await self.database.run(self._create_table, write=True)
+            self._ready = True
+
+    @staticmethod
+    def _expires_at(ttl: float | None) -> float | None:
+        return time.time() + ttl if ttl is not None else None
+
+    async def get(self, key: str) -> str | None:
+        await self._ensure_table()
+        row = await self.database.fetchone(
+            "SELECT value FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()))
+        return row[0] if row else None
+
+    async def set(self, key: str, value: str, ttl: float | None = None):
+        await self._ensure_table()
+        await self.database.write(
+            "INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, self._expires_at(ttl)))
+
+    async def set_if_absent(self, key: str, value: str, ttl: float | None = None,
+                            also: dict[str, tuple[str, float | None]] | None = None) -> bool:
+        await self._ensure_table()
+        return await self.database.run(self._set_if_absent, key, value, ttl, also or {}, write=True)
+
+    def _set_if_absent(self, connection, key: str, value: str, ttl: float | None,
+                       also: dict[str, tuple[str, float | None]]) -> bool:
+        cursor = connection.execute('''
+            INSERT INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+            WHERE shared_state.expires_at IS NOT NULL AND shared_state.expires_at <= ?
+        ''', (key, value, self._expires_at(ttl), time.time()))
+        if cursor.rowcount != 1:
+            return False
+        connection.executemany(
+            "INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+            [(other_key, other_value, self._expires_at(other_ttl))
+             for other_key, (other_value, other_ttl) in also.items()])
+        return True
+
+    async def delete(self, key: str):
+        await self._ensure_table()
+        await self.database.write("DELETE FROM shared_state WHERE key = ?", (key,))
+
+
+def state_backend_from_env() -> StateBackend:
+    """
+    Creates the state backend selected by the `STATE_BACKEND` environment variable,
+    `memory` or `sqlite`. By default a single process keeps its state in memory,
+    and several `WORKERS` share it through SQLite.
+    """
+    default = 'sqlite' if int(os.getenv('WORKERS', 1)) > 1 else 'memory'
+    if os.getenv('STATE_BACKEND', default) == 'memory':
+        return MemoryStateBackend()
+    return SQLiteStateBackend()
@@ -0,0 +1,73 @@
+import asyncio
+import time
+from typing import AsyncIterator, Awaitable
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import Message
+
+MESSAGE_LIMIT = 4096
+
+
+async def answer_streamed(message: Message, chunks: AsyncIterator[str],
+                          min_interval: float = 1.5, after: Awaitable | None = None) -> str:
+    """
+    Posts a streamed text as one message and edits it as new chunks arrive.
+
+    Edits are throttled to at most one per `min_interval` seconds to stay
+    under Telegram's edit rate limits; the final text is always written.
+    Text longer than one Telegram message continues in a new message.
+
+    Args:
+        message (Message): The message to answer.
+        chunks (AsyncIterator[str]): The text generated so far, growing with every item.
+        min_interval (float): Minimum number of seconds between two edits.
+        after (Awaitable | None): Awaited before the first message is sent,
+            e.g. the delivery of the card images.
+
+    Returns:
+        str: The full text.
+    """
+    text = ''
+    offset = 0
+    sent: Message | None = None
+    shown = ''
+    next_edit_at = 0.0
+
+    async def show(segment: str, final: bool = False):
+        nonlocal sent, shown, next_edit_at
+        while segment and segment != shown:
+            try:
+                if sent is None:
+                    sent = await message.answer(segment)
+                else:
+                    await sent.edit_text(segment)
+                shown = segment
+            except TelegramRetryAfter as e:
+                if not final:
+                    next_edit_at = time.monotonic() + e.retry_after
+                    return
+                await asyncio.sleep(e.retry_after)
+            except TelegramBadRequest as e:
+                if 'message is not modified' not in str(e):
+                    raise
+                shown = segment
+        next_edit_at = time.monotonic() + min_interval
+
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        text = chunk
+        if after is not None:
+            await after
+            after = None
+        while len(text) - offset > MESSAGE_LIMIT:
+            await show(text[offset:offset + MESSAGE_LIMIT], final=True)
+            offset += MESSAGE_LIMIT
+            sent, shown = None, ''
+        if time.monotonic() >= next_edit_at:
+            await show(text[offset:])
+
+    if after is not None:
+        await after
+    await show(text[offset:], final=True)
+    return text
@@ -0,0 +1,71 @@
+import sqlite3
+
+import catalog
+from cards import init_db, catalog_version, stored_version, CARD_TABLES
+
+LEGACY_SCHEMA = '''
+    CREATE TABLE {table}
+    (card_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, discription TEXT, url TEXT)
+'''
+
+
+def make_legacy_db(path) -> sqlite3.Connection:
+    """
+    Creates a database with the schema the bot shipped with: misspelled
+    `discription`, no `file_id` and no unique card names, with a duplicate.
+    """
+    connection = sqlite3.connect(path)
+    with connection:
+        for table in CARD_TABLES:
+            connection.execute(LEGACY_SCHEMA.format(table=table))
+        name, description, url = catalog.tarot_cards[0]
+        connection.executemany("INSERT INTO old_cards (name, discription, url) VALUES (?, ?, ?)",
+                               [(name, 'old text', url), (name, 'duplicate', url)])
+    return connection
+
+
+def test_init_db_migrates_legacy_schema(tmp_path):
+    connection = make_legacy_db(tmp_path / 'cards.db')
+    init_db(connection)
+
+    for table in CARD_TABLES:
+        columns = [row[1] for row in connection.execute(f"PRAGMA table_info({table})")]
+        assert 'description' in columns and 'discription' not in columns
+        assert 'file_id' in columns
+    name, description, _ = catalog.tarot_cards[0]
+    rows = connection.execute("SELECT card_id, description FROM old_cards WHERE name = ?", (name,)).fetchall()
+    assert rows == [(1, description)]
+    assert connection.execute("SELECT COUNT(*) FROM old_cards").fetchone()[0] == len(catalog.tarot_cards)
+    assert connection.execute("SELECT COUNT(*) FROM new_cards").fetchone()[0] == len(catalog.tarot_cards_jr)
+    assert stored_version(connection) == catalog_version()
+
+
+def test_init_db_is_a_no_op_when_version_matches(tmp_path):
+    connection = make_legacy_db(tmp_path / 'cards.db')
+    init_db(connection)
+    with connection:
+        connection.execute("UPDATE new_cards SET description = 'edited' WHERE card_id = 1")
+    changes = connection.total_changes
+
+    init_db(connection)
+
+    assert connection.total_changes == changes
+    assert connection.execute("SELECT description FROM new_cards WHERE card_id = 1").fetchone()[0] == 'edited'
+
+
+def test_init_db_clears_file_id_when_url_changes(tmp_path, monkeypatch):
+    connection = make_legacy_db(tmp_path / 'cards.db')
+    init_db(connection)
+    (kept, _, _), (changed, description, _) = catalog.tarot_cards_jr[:2]
+    with connection:
+        connection.execute("UPDATE new_cards SET file_id = 'cached'")
+
+    cards = list(catalog.tarot_cards_jr)
+    cards[1] = (changed, description, 'https://example.com/new.jpg')
+    monkeypatch.setattr(catalog, 'tarot_cards_jr', cards)
+    monkeypatch.setattr('cards.catalog_version', lambda: 'next')
+    init_db(connection)
+
+    file_ids = dict(connection.execute("SELECT name, file_id FROM new_cards WHERE name IN (?, ?)", (kept, changed)))
+    assert file_ids == {kept: 'cached', changed: None}
+    assert stored_version(connection) == 'next'
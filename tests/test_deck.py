@@ -0,0 +1,58 @@
+import asyncio
+import random
+
+from cards import init_db
+from db import Database
+from deck import Card, Deck
+
+
+async def _reload(deck: Deck) -> bool:
+    before = deck.new_cards
+    await deck.reload_if_changed()
+    return deck.new_cards is not before
+
+
+def _card(card_id: int, table_name: str) -> Card:
+    return Card(card_id, f'{table_name} {card_id}', '', f'https://example.com/{card_id}.jpg', None, table_name)
+
+
+def test_draw_spread_is_pure_and_reproducible():
+    deck = Deck()
+    deck.old_cards = tuple(_card(card_id, 'old_cards') for card_id in range(22))
+    deck.new_cards = tuple(_card(card_id, 'new_cards') for card_id in range(56))
+
+    spreads = [deck.draw_spread(random.Random(seed)) for seed in range(50)]
+
+    for spread in spreads:
+        main, *others = spread.cards
+        assert main.table_name == 'old_cards'
+        assert [card.table_name for card in others] == ['new_cards', 'new_cards']
+        assert others[0] != others[1]
+    assert deck.draw_spread(random.Random(1)) == spreads[1]
+    assert len({spread.names[0] for spread in spreads}) > 1
+
+
+def test_deck_reloads_only_when_cards_change(tmp_path):
+    async def scenario():
+        database = Database(str(tmp_path / 'cards.db'))
+        await database.run(init_db, write=True)
+        deck = Deck(database)
+        other_worker = Deck(database)
+        await deck.load()
+        await other_worker.load()
+
+        await database.run(lambda conn: conn.execute('CREATE TABLE other (value TEXT)'), write=True)
+        await database.write('INSERT INTO other (value) VALUES (?)', ('unrelated',))
+        after_unrelated_write = await _reload(deck)
+
+        card = other_worker.new_cards[0]
+        await other_worker.remember_file_id(card, 'file-id')
+        after_file_id = await _reload(deck)
+        reloaded_card = deck.find(card.name)
+        await database.close()
+        return after_unrelated_write, after_file_id, reloaded_card
+
+    after_unrelated_write, after_file_id, reloaded_card = asyncio.run(scenario())
+    assert not after_unrelated_write
+    assert after_file_id
+    assert reloaded_card.file_id == 'file-id'
@@ -0,0 +1,51 @@
+import asyncio
+
+from db import Database
+from history import SpreadHistory
+
+
+def test_page_sees_spreads_of_a_batch_being_written(tmp_path):
+    async def scenario():
+        database = Database(str(tmp_path / 'history.db'))
+        history = SpreadHistory(database, batch_size=100, flush_interval=60)
+        await history.init()
+        write_many = database.write_many
+
+        async def slow_write_many(sql, rows):
+            await asyncio.sleep(0.05)
+            return await write_many(sql, rows)
+
+        database.write_many = slow_write_many
+        history.record(1, ['Шут', 'Туз кубков', 'Двойка мечей'], 'text')
+        flushing = asyncio.create_task(history.flush())
+        await asyncio.sleep(0)
+        entries, has_more = await history.page(1)
+        await flushing
+        await history.close()
+        await database.close()
+        return entries, has_more
+
+    entries, has_more = asyncio.run(scenario())
+    assert [entry.cards for entry in entries] == [['Шут', 'Туз кубков', 'Двойка мечей']]
+    assert not has_more
+
+
+def test_pages_are_newest_first_with_keyset(tmp_path):
+    async def scenario():
+        database = Database(str(tmp_path / 'history.db'))
+        history = SpreadHistory(database, page_size=2)
+        await history.init()
+        for number in range(5):
+            history.record(1, ['a', 'b', str(number)], f'text {number}')
+        history.record(2, ['other'], 'other user')
+        first, first_more = await history.page(1)
+        second, second_more = await history.page(1, first[-1].entry_id)
+        third, third_more = await history.page(1, second[-1].entry_id)
+        await history.close()
+        await database.close()
+        return [first, second, third], [first_more, second_more, third_more]
+
+    pages, more = asyncio.run(scenario())
+    assert [[entry.interpretation for entry in page] for page in pages] == [
+        ['text 4', 'text 3'], ['text 2', 'text 1'], ['text 0']]
+    assert more == [True, True, False]
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import pytest
+
+import interpretations
+from circuit_breaker import CircuitBreaker
+
+
+class EmptyCache:
+    async def get(self, cards):
+        return None
+
+    async def put(self, cards, text):
+        pass
+
+    def incomplete(self, cards):
+        return False
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    monkeypatch.setattr(interpretations, 'interpretation_cache', EmptyCache())
+    monkeypatch.setattr(interpretations, 'breaker', CircuitBreaker(budget=0.2))
+
+    def use(chunks: int, delay: float):
+        async def stream_gpt_interpretation(cards):
+            text = ''
+            for number in range(chunks):
+                await asyncio.sleep(delay)
+                text += f'{number} '
+                yield text
+
+        monkeypatch.setattr(interpretations, 'stream_gpt_interpretation', stream_gpt_interpretation)
+
+    return use
+
+
+async def _stream(cards):
+    started_at = time.monotonic()
+    texts = [text async for text in interpretations.stream_interpretation(cards)]
+    return texts, time.monotonic() - started_at
+
+
+def test_stream_within_budget_is_passed_through(upstream):
+    upstream(chunks=3, delay=0.01)
+    texts, _ = asyncio.run(_stream(['Шут', 'Туз кубков', 'Двойка мечей']))
+    assert texts[-1] == '0 1 2 '
+
+
+def test_stream_over_budget_keeps_partial_text_and_counts_a_failure(upstream):
+    # Every chunk arrives well within the budget, but the whole stream doesn't.
+    upstream(chunks=20, delay=0.05)
+
+    async def scenario():
+        texts, elapsed = await _stream(['Шут', 'Туз кубков', 'Двойка мечей'])
+        # The shared upstream stream runs on its own task and hits the same deadline.
+        await asyncio.sleep(0.1)
+        return texts, elapsed
+
+    texts, elapsed = asyncio.run(scenario())
+    assert texts[-2].startswith('0 1 ')
+    assert texts[-1] == texts[-2].rstrip() + '…'
+    assert elapsed < 0.4
+    assert interpretations.breaker.stats()['failures'] == 1
+    assert interpretations.breaker.stats()['timeouts'] == 1
+
+
+def test_stream_without_text_within_budget_falls_back(upstream):
+    upstream(chunks=1, delay=0.5)
+    texts, elapsed = asyncio.run(_stream(['Шут', 'Туз кубков', 'Двойка мечей']))
+    assert texts == [interpretations.local_interpretation(['Шут', 'Туз кубков', 'Двойка мечей'])]
+    assert elapsed < 0.4
+
+
+def test_empty_stream_falls_back(upstream):
+    upstream(chunks=0, delay=0)
+    texts, _ = asyncio.run(_stream(['Шут', 'Туз кубков', 'Двойка мечей']))
+    assert texts == [interpretations.local_interpretation(['Шут', 'Туз кубков', 'Двойка мечей'])]
+
+
+class FailingCache(EmptyCache):
+    def __init__(self):
+        self.attempts = 0
+
+    async def put(self, cards, text):
+        self.attempts += 1
+        await asyncio.sleep(0.5)
+        raise RuntimeError('database is locked')
+
+
+def test_cache_write_failure_does_not_affect_the_answer(upstream, monkeypatch):
+    cache = FailingCache()
+    monkeypatch.setattr(interpretations, 'interpretation_cache', cache)
+
+    async def get_gpt_interpretation(cards):
+        return 'LLM answer'
+
+    monkeypatch.setattr(interpretations, 'get_gpt_interpretation', get_gpt_interpretation)
+    upstream(chunks=3, delay=0.01)
+    cards = ['Шут', 'Туз кубков', 'Двойка мечей']
+
+    async def scenario():
+        answer = await interpretations.get_interpretation(cards)
+        texts, elapsed = await _stream(cards)
+        await interpretations.drain()
+        return answer, texts, elapsed
+
+    answer, texts, elapsed = asyncio.run(scenario())
+    assert answer == 'LLM answer'
+    assert texts[-1] == '0 1 2 '
+    # The slow commit neither delays the stream nor counts against its budget.
+    assert elapsed < 0.2
+    assert cache.attempts == 2
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from scheduler import Scheduler, SchedulerBusy
+from state import MemoryStateBackend
+
+
+def make_scheduler(**kwargs) -> Scheduler:
+    options = dict(max_concurrency=1, max_queue=10, rate=1000, burst=1000, user_cooldown=5,
+                   state=MemoryStateBackend())
+    options.update(kwargs)
+    return Scheduler(**options)
+
+
+async def _hold(scheduler: Scheduler, release: asyncio.Event, log: list, name: str, priority: int = 0):
+    async with scheduler.slot(priority):
+        log.append(name)
+        await release.wait()
+
+
+def test_full_queue_raises_scheduler_busy():
+    async def scenario():
+        scheduler = make_scheduler(max_queue=1)
+        release = asyncio.Event()
+        log = []
+        holder = asyncio.create_task(_hold(scheduler, release, log, 'holder'))
+        waiter = asyncio.create_task(_hold(scheduler, release, log, 'waiter'))
+        await asyncio.sleep(0.01)
+        with pytest.raises(SchedulerBusy):
+            async with scheduler.slot():
+                pass
+        release.set()
+        await asyncio.gather(holder, waiter)
+        return scheduler, log
+
+    scheduler, log = asyncio.run(scenario())
+    assert log == ['holder', 'waiter']
+    assert scheduler.rejected == 1
+    assert scheduler.stats()['active'] == 0
+
+
+def test_waiters_are_served_by_priority():
+    async def scenario():
+        scheduler = make_scheduler()
+        release = asyncio.Event()
+        log = []
+        holder = asyncio.create_task(_hold(scheduler, release, log, 'holder'))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(_hold(scheduler, release, log, name, priority))
+                   for name, priority in (('background', 10), ('user', 0), ('other user', 0))]
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(holder, *waiters)
+        return log
+
+    assert asyncio.run(scenario()) == ['holder', 'user', 'other user', 'background']
+
+
+def test_cancelled_granted_waiter_hands_slot_over():
+    async def scenario():
+        scheduler = make_scheduler()
+        release = asyncio.Event()
+        log = []
+        holder_release = asyncio.Event()
+        holder = asyncio.create_task(_hold(scheduler, holder_release, log, 'holder'))
+        await asyncio.sleep(0.01)
+        granted = asyncio.create_task(_hold(scheduler, release, log, 'granted'))
+        next_waiter = asyncio.create_task(_hold(scheduler, release, log, 'next'))
+        await asyncio.sleep(0.01)
+        # The holder hands its slot to `granted`, which is cancelled before it runs.
+        holder_release.set()
+        await asyncio.sleep(0)
+        granted.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.wait_for(asyncio.gather(holder, next_waiter), 1)
+        return scheduler, log, granted
+
+    scheduler, log, granted = asyncio.run(scenario())
+    assert granted.cancelled()
+    assert log == ['holder', 'next']
+    assert scheduler.stats()['active'] == 0
+    assert scheduler.queue_depth == 0
+
+
+def test_cancelled_queued_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = make_scheduler()
+        release = asyncio.Event()
+        log = []
+        holder = asyncio.create_task(_hold(scheduler, release, log, 'holder'))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(_hold(scheduler, release, log, 'waiter'))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+        depth = scheduler.queue_depth
+        release.set()
+        await holder
+        return scheduler, depth
+
+    scheduler, depth = asyncio.run(scenario())
+    assert depth == 0
+    assert scheduler.stats()['active'] == 0
+
+
+def test_repeated_press_while_pending_is_collapsed():
+    async def scenario():
+        scheduler = make_scheduler(user_cooldown=5)
+        first = await scheduler.begin_user(1)
+        repeated = await scheduler.begin_user(1)
+        other_user = await scheduler.begin_user(2)
+        return scheduler, first, repeated, other_user
+
+    scheduler, first, repeated, other_user = asyncio.run(scenario())
+    assert first is None
+    assert repeated == 0
+    assert other_user is None
+    assert scheduler.collapsed == 1
+
+
+def test_press_after_finished_spread_waits_for_cooldown():
+    async def scenario():
+        scheduler = make_scheduler(user_cooldown=5)
+        await scheduler.begin_user(1)
+        await scheduler.end_user(1)
+        return scheduler, await scheduler.begin_user(1)
+
+    scheduler, wait = asyncio.run(scenario())
+    assert 0 < wait <= 5
+    assert scheduler.throttled == 1
+
+
+def test_press_after_cooldown_starts_new_spread():
+    async def scenario():
+        scheduler = make_scheduler(user_cooldown=0.05)
+        await scheduler.begin_user(1)
+        await scheduler.end_user(1)
+        await asyncio.sleep(0.06)
+        return await scheduler.begin_user(1)
+
+    assert asyncio.run(scenario()) is None
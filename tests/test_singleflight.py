@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_do_coalesces_concurrent_calls():
+    async def scenario():
+        flights = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return 'result'
+
+        results = await asyncio.gather(*[flights.do('key', work) for _ in range(5)])
+        return calls, results, flights.in_flight()
+
+    calls, results, in_flight = asyncio.run(scenario())
+    assert calls == 1
+    assert results == ['result'] * 5
+    assert in_flight == 0
+
+
+def test_do_cancelled_caller_does_not_cancel_others():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return 'result'
+
+        first = asyncio.create_task(flights.do('key', work))
+        second = asyncio.create_task(flights.do('key', work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return first, await second
+
+    first, result = asyncio.run(scenario())
+    assert first.cancelled()
+    assert result == 'result'
+
+
+def test_do_propagates_errors_to_every_caller():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError('upstream failed')
+
+        return await asyncio.gather(*[flights.do('key', work) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert len(results) == 3
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+async def _collect(stream) -> list:
+    return [value async for value in stream]
+
+
+def test_stream_shares_one_upstream_stream():
+    async def scenario():
+        flights = SingleFlight()
+        starts = 0
+
+        async def upstream():
+            nonlocal starts
+            starts += 1
+            for text in ('a', 'ab', 'abc'):
+                await asyncio.sleep(0.01)
+                yield text
+
+        results = await asyncio.gather(*[_collect(flights.stream('key', upstream)) for _ in range(3)])
+        return starts, results
+
+    starts, results = asyncio.run(scenario())
+    assert starts == 1
+    assert all(result[-1] == 'abc' for result in results)
+
+
+def test_stream_cancelled_subscriber_does_not_cancel_others():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def upstream():
+            yield 'a'
+            await release.wait()
+            yield 'ab'
+
+        first = asyncio.create_task(_collect(flights.stream('key', upstream)))
+        second = asyncio.create_task(_collect(flights.stream('key', upstream)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return first, await second
+
+    first, result = asyncio.run(scenario())
+    assert first.cancelled()
+    assert result[-1] == 'ab'
+
+
+def test_stream_propagates_errors_to_every_subscriber():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def upstream():
+            yield 'a'
+            await asyncio.sleep(0.01)
+            raise ValueError('upstream failed')
+
+        return await asyncio.gather(*[_collect(flights.stream('key', upstream)) for _ in range(3)],
+                                    return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_stream_error_before_first_value_reaches_subscriber():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def upstream():
+            raise ValueError('upstream failed')
+            yield
+
+        await _collect(flights.stream('key', upstream))
+
+    with pytest.raises(ValueError):
+        asyncio.run(scenario())
+
+
+def test_joins_reports_calls_in_flight():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+
+        before = flights.joins('key')
+        task = asyncio.create_task(flights.do('key', work))
+        await asyncio.sleep(0)
+        during = flights.joins('key')
+        release.set()
+        await task
+        return before, during, flights.joins('key')
+
+    assert asyncio.run(scenario()) == (False, True, False)
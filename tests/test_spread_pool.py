@@ -0,0 +1,15 @@
+import pytest
+
+from spread_pool import SpreadPool
+
+
+@pytest.mark.parametrize('refill_rate', [0, -1])
+def test_enabled_pool_requires_positive_refill_rate(refill_rate):
+    with pytest.raises(ValueError):
+        SpreadPool(target_size=10, refill_rate=refill_rate)
+
+
+def test_disabled_pool_ignores_refill_rate():
+    pool = SpreadPool(target_size=0, refill_rate=0)
+    assert not pool.enabled
+    assert pool.pop() is None
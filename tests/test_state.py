@@ -0,0 +1,35 @@
+import asyncio
+
+from db import Database
+from scheduler import Scheduler
+from state import MemoryStateBackend, SQLiteStateBackend, state_backend_from_env
+
+
+def test_begin_user_sets_pending_and_cooldown_together(tmp_path):
+    async def scenario():
+        database = Database(str(tmp_path / 'state.db'))
+        state = SQLiteStateBackend(database)
+        scheduler = Scheduler(user_cooldown=60, state=state)
+        first = await scheduler.begin_user(1)
+        values = await state.get('pending:1'), await state.get('cooldown:1')
+        # A collapsed press must not move the cooldown of the pending spread.
+        won = await state.set_if_absent('pending:1', 'later', also={'cooldown:1': ('later', 60)})
+        cooldown = await state.get('cooldown:1')
+        await database.close()
+        return first, values, won, cooldown
+
+    first, (pending, cooldown), won, cooldown_after = asyncio.run(scenario())
+    assert first is None
+    assert pending is not None and pending == cooldown
+    assert not won
+    assert cooldown_after == cooldown
+
+
+def test_state_backend_defaults_to_memory_for_one_worker(monkeypatch):
+    monkeypatch.delenv('STATE_BACKEND', raising=False)
+    monkeypatch.delenv('WORKERS', raising=False)
+    assert isinstance(state_backend_from_env(), MemoryStateBackend)
+    monkeypatch.setenv('WORKERS', '4')
+    assert isinstance(state_backend_from_env(), SQLiteStateBackend)
+    monkeypatch.setenv('STATE_BACKEND', 'memory')
+    assert isinstance(state_backend_from_env(), MemoryStateBackend)
@@ -0,0 +1,57 @@
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from middlewares import InFlightMiddleware
+
+
+async def register_webhook(bot: Bot, base_url: str, path: str, secret: str | None):
+    """
+    Tells Telegram where to deliver updates.
+
+    Args:
+        bot (Bot): The bot instance.
+        base_url (str): Public URL of the server.
+        path (str): The path the webhook is served on.
+        secret (str | None): Secret token Telegram must send with every update.
+    """
+    url = f"{base_url.rstrip('/')}{path}"
+    await bot.set_webhook(url, secret_token=secret)
+    logging.info('Webhook set to %s', url)
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, inflight: InFlightMiddleware, *,
+                       path: str, base_url: str | None, secret: str | None,
+                       drain_timeout: float = 30.0) -> web.Application:
+    """
+    Builds the aiohttp application receiving updates from Telegram.
+
+    Args:
+        dp (Dispatcher): The dispatcher to feed updates to.
+        bot (Bot): The bot instance.
+        inflight (InFlightMiddleware): Tracks the handlers to wait for on shutdown.
+        path (str): The path the webhook is served on.
+        base_url (str | None): Public URL of the server; if set, the webhook
+            is registered with Telegram on startup.
+        secret (str | None): Secret token Telegram must send with every update.
+        drain_timeout (float): Seconds to wait for in-flight handlers on shutdown.
+
+    Returns:
+        web.Application: The configured application.
+    """
+    app = web.Application()
+
+    async def on_startup(_: web.Application):
+        if base_url:
+            await register_webhook(bot, base_url, path, secret)
+
+    async def on_shutdown(_: web.Application):
+        await inflight.drain(drain_timeout)
+
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+    return app